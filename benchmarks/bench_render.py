@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# Measures the rendering and reading hot paths offscreen, without IDA.
+#
+#   ./benchmarks/bench_render.py --save baseline.json
+#   ./benchmarks/bench_render.py --compare baseline.json
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import types
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_DATA_SIZE = 0x1000000
+_SEGMENT_SIZE = 0x8000
+_CANVAS_SIZES = [(256, 256), (800, 600), (2048, 2048)]
+_READ_SIZES = [0x10000, 0x100000, 0x1000000]
+
+
+def _get_data():
+    # deterministic, compressible-looking data rather than pure noise
+    pattern = bytes((i * 7 + (i >> 8) * 13) & 0xFF for i in range(0x10000))
+    return pattern * (_DATA_SIZE // len(pattern))
+
+
+def _install_ida_stub(data):
+    # Just enough of idaapi/idc for MemoryReader: the data split into
+    # segments with a gap after each one.
+    segments = [
+        types.SimpleNamespace(
+            start_ea=start, end_ea=start + _SEGMENT_SIZE, type=0
+        )
+        for start in range(0, len(data), 2 * _SEGMENT_SIZE)
+    ]
+
+    class Hooks(object):
+        def hook(self):
+            pass
+
+    idaapi = types.ModuleType("idaapi")
+    idaapi.SEG_XTRN = 1
+    idaapi.DSTATE_RUN = 1
+    idaapi.MFF_READ = 1
+    idaapi.IDB_Hooks = Hooks
+    idaapi.DBG_Hooks = Hooks
+    idaapi.get_segm_qty = lambda: len(segments)
+    idaapi.getnseg = lambda idx: segments[idx]
+    idaapi.get_process_state = lambda: 0
+    idaapi.execute_sync = lambda func, _flags: func()
+    idaapi.cvar = types.SimpleNamespace(
+        inf=types.SimpleNamespace(minEA=0, maxEA=len(data))
+    )
+
+    idc = types.ModuleType("idc")
+    idc.get_bytes = lambda address, size: data[address : address + size]
+    idc.atoa = lambda address: "%08X" % address
+
+    sys.modules["idaapi"] = idaapi
+    sys.modules["idc"] = idc
+
+
+def _measure(func, min_time):
+    func()  # warm up caches
+    count = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return count / elapsed
+
+
+def bench_renderer(librgb, reader, min_time, case_filter=None):
+    from librgb.renderer import Renderer
+
+    results = {}
+    for pixel_format, name in librgb.PixelFormats.get_short_names().items():
+        for width, height in _CANVAS_SIZES:
+            for flip in (False, True):
+                for brightness in (50.0, 70.0):
+                    params = librgb.RendererParams()
+                    params.readers = [reader]
+                    params.format = pixel_format
+                    params.width = width
+                    params.height = height
+                    params.flip = flip
+                    params.brightness = brightness
+                    key = "render %s %dx%d%s%s" % (
+                        name,
+                        width,
+                        height,
+                        " flip" if flip else "",
+                        " brightness" if brightness != 50.0 else "",
+                    )
+                    if case_filter and case_filter not in key:
+                        continue
+
+                    def render():
+                        Renderer(params).get_pixmap()
+
+                    fps = _measure(render, min_time)
+                    results[key] = (fps, fps * params.shown_bytes)
+    return results
+
+
+def bench_readers(librgb, data, min_time, case_filter=None):
+    results = {}
+    with tempfile.NamedTemporaryFile(delete=False) as handle:
+        handle.write(data)
+    try:
+        readers = [
+            ("FileReader mmap", librgb.FileReader(handle.name)),
+            (
+                "FileReader read",
+                librgb.FileReader(handle.name, use_mmap=False),
+            ),
+            ("MemoryReader", librgb.MemoryReader()),
+        ]
+        for name, reader in readers:
+            for size in _READ_SIZES:
+                key = "read %s %d" % (name, size)
+                if case_filter and case_filter not in key:
+                    continue
+                # unaligned to defeat zero-copy paths and block boundaries
+                address = 0x1233
+
+                def read():
+                    bytes(reader.get_padded_bytes_at(address, size))
+
+                rate = _measure(read, min_time)
+                results[key] = (rate, rate * size)
+    finally:
+        os.unlink(handle.name)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for key, (rate, _throughput) in sorted(results.items()):
+        if key in baseline and rate < baseline[key][0] * (1 - tolerance):
+            regressions.append((key, baseline[key][0], rate))
+    for key, old_rate, new_rate in regressions:
+        print(
+            "REGRESSION %-50s %10.1f -> %10.1f /s" % (key, old_rate, new_rate)
+        )
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Measures the rendering and reading hot paths offscreen."
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.2,
+        help="seconds to spend on each case",
+    )
+    parser.add_argument("--filter", help="only run cases containing this")
+    parser.add_argument("--save", metavar="JSON", help="save results")
+    parser.add_argument(
+        "--compare", metavar="JSON", help="compare results with a baseline"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="allowed relative slowdown against the baseline",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    data = _get_data()
+    _install_ida_stub(data)
+
+    import librgb
+    from librgb.qt_shims import QtWidgets
+    from librgb.reader import Reader
+
+    class SyntheticReader(Reader):
+        @property
+        def min_address(self):
+            return 0
+
+        @property
+        def max_address(self):
+            return len(data)
+
+        def get_padded_bytes_at(self, address, size):
+            chunk = memoryview(data)[address : address + size]
+            return chunk if len(chunk) == size else bytes(size)
+
+    _app = QtWidgets.QApplication(sys.argv)
+    results = {}
+    results.update(
+        bench_renderer(librgb, SyntheticReader(), args.min_time, args.filter)
+    )
+    results.update(bench_readers(librgb, data, args.min_time, args.filter))
+
+    for key, (rate, throughput) in sorted(results.items()):
+        print("%-50s %10.1f /s %10.1f MB/s" % (key, rate, throughput / 1e6))
+
+    if args.save:
+        with open(args.save, "w") as handle:
+            json.dump(results, handle, indent=4, sort_keys=True)
+    if args.compare:
+        with open(args.compare, "r") as handle:
+            baseline = json.load(handle)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
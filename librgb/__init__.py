@@ -1,6 +1,11 @@
+from .bookmarks import BookmarkStore
+from .buffer_reader import BufferReader
+from .compressed_file_reader import CompressedFileReader
 from .file_reader import FileReader
 from .memory_reader import MemoryReader
 from .pixel_formats import PixelFormats
+from .prefetching_reader import PrefetchingReader
+from .process_reader import ProcessReader
 from .renderer_params import RendererParams
 from .shortcut_manager import ShortcutManager
 from .window_adapter import GenericWindowAdapter
@@ -0,0 +1,277 @@
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import threading
+import zlib
+
+from librgb.qt_shims import QtGui
+from librgb.renderer import Renderer
+
+# rendered frames waiting to be written
+MAX_QUEUED_FRAMES = 4
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_MAX_CHUNK_SIZE = 0x100000
+_END = object()
+
+
+# One frame at every `step` bytes from `address` up to `end_address`.
+def get_sweep_frames(reader, address, end_address, step):
+    return [
+        (reader, frame_address)
+        for frame_address in range(address, end_address, max(1, step))
+    ]
+
+
+# One frame for each reader, at its current address.
+def get_reader_frames(readers):
+    return [(reader, reader.address) for reader in readers]
+
+
+def _write_chunk(handle, chunk_type, data):
+    handle.write(struct.pack(">I", len(data)))
+    handle.write(chunk_type)
+    handle.write(data)
+    handle.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunk_type))))
+
+
+# Writes frames into an animated PNG as they come, holding only the frame
+# being written. The frame count goes first in the file, so it's corrected
+# on close if fewer frames got written.
+class ApngWriter(object):
+    def __init__(self, path, fps, frame_count):
+        self.path = path
+        # delays are fractions of 16-bit numbers
+        self.delay = (100, max(1, min(0xFFFF, int(round(fps * 100)))))
+        self.frame_count = frame_count
+        self.size = None
+        self._handle = open(path, "wb")
+        self._animation_control_offset = None
+        self._frames = 0
+        self._sequence = 0
+
+    def write(self, image):
+        # Qt 5.2+
+        image = image.convertToFormat(QtGui.QImage.Format_RGBA8888)
+        width, height = image.width(), image.height()
+        if self.size is None:
+            self._write_header(width, height)
+        elif self.size != (width, height):
+            raise ValueError("All frames must be of the same size")
+
+        _write_chunk(
+            self._handle,
+            b"fcTL",
+            struct.pack(
+                ">IIIIIHHBB",
+                self._next_sequence(),
+                width,
+                height,
+                0,
+                0,
+                self.delay[0],
+                self.delay[1],
+                0,
+                0,
+            ),
+        )
+        compressor = zlib.compressobj()
+        pending = []
+        pending_size = 0
+        bits = image.constBits()
+        bits.setsize(image.bytesPerLine() * height)
+        rows = memoryview(bits)
+        for y in range(height):
+            start = y * image.bytesPerLine()
+            # no filter
+            for data in (
+                compressor.compress(b"\x00"),
+                compressor.compress(rows[start : start + width * 4]),
+            ):
+                pending.append(data)
+                pending_size += len(data)
+            if pending_size >= _MAX_CHUNK_SIZE:
+                self._write_frame_data(b"".join(pending))
+                pending, pending_size = [], 0
+        pending.append(compressor.flush())
+        self._write_frame_data(b"".join(pending))
+        self._frames += 1
+
+    def close(self):
+        if self.size is not None:
+            _write_chunk(self._handle, b"IEND", b"")
+            if self._frames != self.frame_count:
+                self._handle.seek(self._animation_control_offset)
+                self._write_animation_control(self._frames)
+        self._handle.close()
+
+    def _write_header(self, width, height):
+        self.size = (width, height)
+        self._handle.write(_PNG_SIGNATURE)
+        _write_chunk(
+            self._handle,
+            b"IHDR",
+            struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0),
+        )
+        self._animation_control_offset = self._handle.tell()
+        self._write_animation_control(self.frame_count)
+
+    def _write_animation_control(self, frame_count):
+        # loops forever
+        _write_chunk(self._handle, b"acTL", struct.pack(">II", frame_count, 0))
+
+    def _write_frame_data(self, data):
+        if not data:
+            return
+        # the first frame doubles as the still image
+        if self._frames == 0:
+            _write_chunk(self._handle, b"IDAT", data)
+        else:
+            _write_chunk(
+                self._handle,
+                b"fdAT",
+                struct.pack(">I", self._next_sequence()) + data,
+            )
+
+    def _next_sequence(self):
+        self._sequence += 1
+        return self._sequence - 1
+
+
+# Pipes raw frames to ffmpeg, which encodes them into whatever the extension
+# of the path calls for (GIF, MP4, WebM, ...).
+class FfmpegWriter(object):
+    def __init__(self, path, fps, executable="ffmpeg"):
+        self.path = path
+        self.fps = fps
+        self.size = None
+        self.executable = shutil.which(executable)
+        if self.executable is None:
+            raise RuntimeError(
+                "Exporting %s requires ffmpeg"
+                % (os.path.splitext(path)[1] or path)
+            )
+        self._process = None
+
+    def write(self, image):
+        image = image.convertToFormat(QtGui.QImage.Format_ARGB32)
+        width, height = image.width(), image.height()
+        if self._process is None:
+            self.size = (width, height)
+            self._process = subprocess.Popen(
+                [
+                    self.executable,
+                    "-loglevel",
+                    "error",
+                    "-y",
+                    "-f",
+                    "rawvideo",
+                    "-pix_fmt",
+                    "bgra",
+                    "-s",
+                    "%dx%d" % (width, height),
+                    "-r",
+                    "%g" % self.fps,
+                    "-i",
+                    "-",
+                    # most video codecs require even sizes
+                    "-vf",
+                    "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                    self.path,
+                ],
+                stdin=subprocess.PIPE,
+            )
+        elif self.size != (width, height):
+            raise ValueError("All frames must be of the same size")
+
+        bits = image.constBits()
+        bits.setsize(image.bytesPerLine() * height)
+        # ARGB32 rows are never padded
+        self._process.stdin.write(bits)
+
+    def close(self):
+        if self._process is None:
+            return
+        self._process.stdin.close()
+        if self._process.wait() != 0:
+            raise RuntimeError("ffmpeg failed to write %s" % self.path)
+
+
+def open_writer(path, fps, frame_count):
+    if os.path.splitext(path)[1].lower() in (".png", ".apng"):
+        return ApngWriter(path, fps, frame_count)
+    return FfmpegWriter(path, fps)
+
+
+# Renders the frames on a background thread while the calling thread writes
+# them. At most MAX_QUEUED_FRAMES rendered frames wait for the writer, so
+# long sweeps don't pile up in memory. `frames` are (reader, address) pairs
+# of the view of `params`; `progress` gets the number of written frames, also
+# while waiting for a slow frame, so that a GUI can keep processing events.
+# Returns the number of written frames.
+def export_animation(
+    params, frames, path, fps, progress=None, is_cancelled=None
+):
+    if not frames:
+        raise ValueError("There are no frames to export")
+    params = params.copy()
+    rendered = queue.Queue(MAX_QUEUED_FRAMES)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                rendered.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def render():
+        try:
+            previous_frame = None
+            for reader, address in frames:
+                if stop.is_set():
+                    return
+                renderer = Renderer(
+                    params,
+                    previous_frame=previous_frame,
+                    reader=reader,
+                    address=address,
+                )
+                put(renderer.get_image(stop.is_set))
+                previous_frame = renderer.frame
+        except Exception as ex:  # pylint: disable=broad-except
+            put(ex)
+        finally:
+            put(_END)
+
+    writer = open_writer(path, fps, len(frames))
+    thread = threading.Thread(target=render, name="librgb animation")
+    thread.daemon = True
+    thread.start()
+    written = 0
+    try:
+        while not (is_cancelled and is_cancelled()):
+            try:
+                image = rendered.get(timeout=0.1)
+            except queue.Empty:
+                if progress:
+                    progress(written)
+                continue
+            if image is _END:
+                break
+            if isinstance(image, Exception):
+                raise image
+            if image is not None:
+                writer.write(image)
+                written += 1
+            if progress:
+                progress(written)
+    finally:
+        # not joined, so that cancelling doesn't wait for the frame being
+        # rendered; the thread drops it and ends once it sees `stop`
+        stop.set()
+        writer.close()
+    return written
@@ -0,0 +1,124 @@
+import collections
+import csv
+import hashlib
+import multiprocessing
+import os
+import re
+
+from librgb.compressed_file_reader import open_file
+from librgb.pixel_formats import PixelFormats
+from librgb.renderer import Renderer
+from librgb.renderer_params import RendererParams
+
+BatchSpec = collections.namedtuple(
+    "BatchSpec", "path address format width height flip brightness"
+)
+
+# Readers opened so far by the current (worker) process, keyed by path.
+_readers = {}
+
+
+def read_specs(handle, flip=False, brightness=50.0):
+    # file,address,format,width,height[,...] - address in hex, format by
+    # short name; anything past the height (e.g. scan scores) is ignored.
+    # Malformed rows are reported and skipped.
+    specs = []
+    rows = csv.reader(handle)
+    for row in rows:
+        if not row or row[0].strip().startswith("#"):
+            continue
+        try:
+            if len(row) < 5:
+                raise ValueError(
+                    "expected FILE,HEXADDRESS,FORMAT,WIDTH,HEIGHT"
+                )
+            path, address, fmt, width, height = [
+                item.strip() for item in row[:5]
+            ]
+            specs.append(
+                BatchSpec(
+                    path=path,
+                    address=int(address, 16),
+                    format=PixelFormats.from_short_name(fmt),
+                    width=int(width),
+                    height=int(height),
+                    flip=flip,
+                    brightness=brightness,
+                )
+            )
+        except (ValueError, RuntimeError) as ex:
+            print(
+                "[librgb] Skipping line %d of the spec: %s"
+                % (rows.line_num, ex)
+            )
+    return specs
+
+
+def sweep_specs(spec, end_address, step=None):
+    if step is None:
+        step = (
+            spec.width * spec.height * Renderer.get_bit_count(spec.format)
+        ) // 8
+    return [
+        spec._replace(address=address)
+        for address in range(spec.address, end_address, max(1, step))
+    ]
+
+
+# The name of the file is followed by a hash of its full path, so that files
+# of the same name in different directories don't overwrite each other.
+def get_output_name(spec):
+    path_hash = hashlib.sha1(
+        os.path.abspath(spec.path).encode("utf-8", "surrogateescape")
+    ).hexdigest()[:8]
+    name = "%s_%s_%08x_%s_%dx%d.png" % (
+        os.path.basename(spec.path),
+        path_hash,
+        spec.address,
+        PixelFormats.get_short_names()[spec.format],
+        spec.width,
+        spec.height,
+    )
+    return re.sub(r"[^\w.-]", "_", name)
+
+
+def render_spec(spec, output_dir, use_mmap=True):
+    if spec.path not in _readers:
+        _readers[spec.path] = open_file(spec.path, use_mmap=use_mmap)
+    reader = _readers[spec.path]
+
+    params = RendererParams()
+    params.readers = [reader]
+    params.format = spec.format
+    params.width = spec.width
+    params.height = spec.height
+    params.flip = spec.flip
+    params.brightness = spec.brightness
+    reader.address = spec.address
+
+    path = os.path.join(output_dir, get_output_name(spec))
+    if not Renderer(params).get_image().save(path, "PNG"):
+        raise RuntimeError("Failed to save " + path)
+    return path
+
+
+def _render_job(job):
+    return render_spec(*job)
+
+
+# Renders the specs to PNG files without needing a display, spreading the
+# work over a pool of processes. Yields the paths as they get written.
+def render_batch(specs, output_dir, jobs=None, use_mmap=True):
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    pool = multiprocessing.Pool(jobs)
+    try:
+        for path in pool.imap_unordered(
+            _render_job,
+            [(spec, output_dir, use_mmap) for spec in specs],
+            chunksize=4,
+        ):
+            yield path
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,126 @@
+import collections
+import functools
+
+from librgb.pixel_formats import PixelFormats
+
+try:
+    import numpy
+
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+# Describes a pixel as an unsigned integer made of bit fields: the channels
+# listed from the most to the least significant bits ("R", "G", "B", "A",
+# "L" for luminance, "X" for unused bits) with their widths. Pixels are
+# read from a stream of bits, most significant bit first if big endian;
+# for whole bytes that's simply the byte order.
+PixelLayout = collections.namedtuple(
+    "PixelLayout", "channels channel_bits big_endian"
+)
+
+_LAYOUTS = {
+    PixelFormats.GRAY2: PixelLayout("L", (2,), True),
+    PixelFormats.GRAY4: PixelLayout("L", (4,), True),
+    PixelFormats.GRAY12: PixelLayout("L", (12,), True),
+    PixelFormats.GRAY16: PixelLayout("L", (16,), False),
+    PixelFormats.RGBA4444: PixelLayout("RGBA", (4, 4, 4, 4), False),
+    PixelFormats.ARGB1555: PixelLayout("ARGB", (1, 5, 5, 5), False),
+    PixelFormats.RGB10A2: PixelLayout("ABGR", (2, 10, 10, 10), False),
+}
+
+
+def is_packed_format(pixel_format):
+    return pixel_format in _LAYOUTS
+
+
+def get_bit_count(pixel_format):
+    return sum(_LAYOUTS[pixel_format].channel_bits)
+
+
+def has_color(pixel_format):
+    return "L" not in _LAYOUTS[pixel_format].channels
+
+
+def has_alpha(pixel_format):
+    return "A" in _LAYOUTS[pixel_format].channels
+
+
+# Scales the values of a channel of given width to 8 bits, adjusting the
+# brightness on the way.
+@functools.lru_cache(maxsize=32)
+def _get_channel_table(bits, brightness_table):
+    maximum = (1 << bits) - 1
+    values = numpy.arange(maximum + 1, dtype=numpy.uint32)
+    values = (values * 0xFF + maximum // 2) // maximum
+    if brightness_table is not None:
+        values = numpy.frombuffer(brightness_table, dtype=numpy.uint8)[values]
+    return values.astype(numpy.uint8)
+
+
+# Returns the pixels of each row as integers.
+def _get_pixels(data, width, height, stride, bits, big_endian):
+    rows = numpy.frombuffer(data, dtype=numpy.uint8)
+    rows = rows[: stride * height].reshape(height, stride)
+    if bits in (8, 16, 32):
+        dtype = numpy.dtype("%su%d" % (">" if big_endian else "<", bits // 8))
+        row_size = width * dtype.itemsize
+        return numpy.ascontiguousarray(rows[:, :row_size]).view(dtype)
+
+    # gather enough bytes to hold a pixel at any bit offset, then shift
+    offsets = numpy.arange(width, dtype=numpy.uint64) * numpy.uint64(bits)
+    first_bytes = (offsets // numpy.uint64(8)).astype(numpy.intp)
+    skipped_bits = offsets % numpy.uint64(8)
+    count = (bits + 7) // 8 + 1
+    padded = numpy.zeros((height, stride + count), dtype=numpy.uint8)
+    padded[:, :stride] = rows
+    chunks = numpy.zeros((height, width), dtype=numpy.uint64)
+    for i in range(count):
+        chunk = padded[:, first_bytes + i].astype(numpy.uint64)
+        if big_endian:
+            chunks = (chunks << numpy.uint64(8)) | chunk
+        else:
+            chunks |= chunk << numpy.uint64(8 * i)
+    if big_endian:
+        chunks >>= numpy.uint64(count * 8 - bits) - skipped_bits
+    else:
+        chunks >>= skipped_bits
+    return chunks & numpy.uint64((1 << bits) - 1)
+
+
+# Unpacks rows of pixels to 8-bit grays (for luminance-only layouts) or to
+# BGRA, with the brightness of all but the alpha channel adjusted.
+def unpack(data, pixel_format, width, height, stride, brightness_table=None):
+    if not HAS_NUMPY:
+        raise RuntimeError("Packed formats require numpy")
+
+    layout = _LAYOUTS[pixel_format]
+    pixels = _get_pixels(
+        data,
+        width,
+        height,
+        stride,
+        sum(layout.channel_bits),
+        layout.big_endian,
+    )
+
+    fields = {}
+    shift = 0
+    for name, bits in zip(layout.channels[::-1], layout.channel_bits[::-1]):
+        fields[name] = (bits, shift)
+        shift += bits
+
+    def get_channel(name, table):
+        bits, shift = fields[name]
+        values = (pixels >> shift) & ((1 << bits) - 1)
+        return numpy.take(_get_channel_table(bits, table), values)
+
+    if "L" in fields:
+        return get_channel("L", brightness_table)
+
+    out = numpy.empty((height, width, 4), dtype=numpy.uint8)
+    for channel, name in enumerate("BGR"):
+        out[:, :, channel] = get_channel(name, brightness_table)
+    out[:, :, 3] = get_channel("A", None) if "A" in fields else 0xFF
+    return out
@@ -0,0 +1,75 @@
+from librgb.pixel_formats import PixelFormats
+from librgb.qt_shims import QtCore, QtGui, QtWidgets
+
+
+# Shows the bookmarks of a store as a grid of their previews. Clicking one
+# passes it to the callback; its context menu deletes it.
+class BookmarkView(QtWidgets.QWidget):
+    PREVIEW_SIZE = 160
+
+    def __init__(self, callback, parent=None):
+        super(BookmarkView, self).__init__(parent)
+        self.callback = callback
+        self._layout = QtWidgets.QGridLayout()
+        self._layout.setAlignment(QtCore.Qt.AlignTop | QtCore.Qt.AlignLeft)
+        self.setLayout(self._layout)
+        self._columns = 1
+
+    def show_bookmarks(self, store, columns):
+        self.clear()
+        self._columns = columns
+        if not store.bookmarks:
+            self._layout.addWidget(
+                QtWidgets.QLabel("No bookmarks yet, press B to add one"),
+                0,
+                0,
+            )
+            return
+
+        short_names = PixelFormats.get_short_names()
+        for idx, bookmark in enumerate(store.bookmarks):
+            button = QtWidgets.QToolButton()
+            button.setToolButtonStyle(QtCore.Qt.ToolButtonTextUnderIcon)
+            button.setIconSize(
+                QtCore.QSize(self.PREVIEW_SIZE, self.PREVIEW_SIZE)
+            )
+            button.setText(bookmark.name)
+            button.setToolTip(
+                "%X, %s, %dx%d"
+                % (
+                    bookmark.address,
+                    short_names[bookmark.format],
+                    bookmark.width,
+                    bookmark.height,
+                )
+            )
+            preview = store.get_preview(bookmark)
+            if preview is not None:
+                button.setIcon(QtGui.QIcon(QtGui.QPixmap.fromImage(preview)))
+            button.clicked.connect(
+                lambda _checked=False, bookmark=bookmark: self.callback(
+                    bookmark
+                )
+            )
+
+            delete_action = QtWidgets.QAction("Delete", button)
+            delete_action.triggered.connect(
+                lambda _checked=False, bookmark=bookmark: self._delete(
+                    store, bookmark
+                )
+            )
+            button.addAction(delete_action)
+            button.setContextMenuPolicy(QtCore.Qt.ActionsContextMenu)
+
+            self._layout.addWidget(button, idx // columns, idx % columns)
+
+    def clear(self):
+        while self._layout.count():
+            self._layout.takeAt(0).widget().setParent(None)
+
+    def _delete(self, store, bookmark):
+        store.remove(bookmark)
+        # not from within the handler of the button that's about to go
+        QtCore.QTimer.singleShot(
+            0, lambda: self.show_bookmarks(store, self._columns)
+        )
@@ -0,0 +1,182 @@
+import collections
+import json
+import os
+import uuid
+
+from librgb.compressed_file_reader import open_file
+from librgb.pixel_formats import PixelFormats
+from librgb.qt_shims import QtGui
+
+_Bookmark = collections.namedtuple(
+    "Bookmark",
+    "name address format width height flip brightness row_alignment "
+    "palette_address palette_format palette_file preview",
+)
+
+
+# Absolute path of the file a reader reads, if any.
+def _get_path(reader):
+    path = getattr(reader, "path", None)
+    return None if path is None else os.path.abspath(path)
+
+
+# A named view of some data; `palette_file` is the path of the file the
+# palette is read from, if not the viewed one, and `preview` is the file
+# name of its downsampled image, if any.
+class Bookmark(_Bookmark):
+    __slots__ = ()
+
+    @classmethod
+    def from_params(cls, name, params):
+        return cls(
+            name=name,
+            address=params.reader.address,
+            format=params.format,
+            width=params.width,
+            height=params.height,
+            flip=params.flip,
+            brightness=params.brightness,
+            row_alignment=params.row_alignment,
+            palette_address=params.palette_address,
+            palette_format=params.palette_format,
+            palette_file=_get_path(params.palette_reader),
+            preview=None,
+        )
+
+    def apply(self, params):
+        params.reader.address = self.address
+        params.format = self.format
+        params.width = self.width
+        params.height = self.height
+        params.flip = self.flip
+        params.brightness = self.brightness
+        params.row_alignment = self.row_alignment
+        params.palette_address = self.palette_address
+        params.palette_format = self.palette_format
+        if self.palette_file is None:
+            params.palette_reader = None
+        elif not os.path.isfile(self.palette_file):
+            print("[librgb] Palette file %s is gone" % self.palette_file)
+            params.palette_reader = None
+            params.palette_address = None
+        elif _get_path(params.palette_reader) != self.palette_file:
+            params.palette_reader = open_file(self.palette_file)
+
+    def to_dict(self):
+        result = self._asdict()
+        short_names = PixelFormats.get_short_names()
+        result["format"] = short_names[self.format]
+        result["palette_format"] = short_names[self.palette_format]
+        return result
+
+    @classmethod
+    def from_dict(cls, item):
+        item = dict(item)
+        item["format"] = PixelFormats.from_short_name(item["format"])
+        # bookmarks saved before palettes were kept
+        item["palette_format"] = (
+            PixelFormats.from_short_name(item["palette_format"])
+            if "palette_format" in item
+            else PixelFormats.BGR888
+        )
+        item.setdefault("palette_address", None)
+        item.setdefault("palette_file", None)
+        return cls(**item)
+
+
+# Bookmarks of a single binary, identified by the content key of its reader,
+# along with their previews. Both are kept as files under DIRECTORY and only
+# read when first needed.
+class BookmarkStore(object):
+    DIRECTORY = os.path.join(os.path.expanduser("~"), ".rgb")
+
+    def __init__(self, key):
+        self.key = key
+        self._bookmarks = None
+        self._previews = {}
+
+    @property
+    def path(self):
+        return os.path.join(self.DIRECTORY, "bookmarks", self.key + ".json")
+
+    @property
+    def bookmarks(self):
+        if self._bookmarks is None:
+            try:
+                with open(self.path, "r") as handle:
+                    self._bookmarks = [
+                        Bookmark.from_dict(item)
+                        for item in json.load(handle)["bookmarks"]
+                    ]
+            except FileNotFoundError:
+                self._bookmarks = []
+            except (OSError, ValueError, KeyError, TypeError) as ex:
+                print("[librgb] Couldn't read %s: %s" % (self.path, ex))
+                self._bookmarks = []
+        return self._bookmarks
+
+    def find(self, name):
+        for bookmark in self.bookmarks:
+            if bookmark.name == name:
+                return bookmark
+        return None
+
+    # Adds the bookmark, replacing any other one of the same name.
+    def add(self, bookmark, preview=None):
+        old_bookmark = self.find(bookmark.name)
+        if old_bookmark is not None:
+            self.remove(old_bookmark)
+        if preview is not None and not preview.isNull():
+            file_name = "%s-%s.png" % (self.key, uuid.uuid4().hex)
+            self._make_dirs()
+            if preview.save(self._get_preview_path(file_name), "PNG"):
+                bookmark = bookmark._replace(preview=file_name)
+                self._previews[file_name] = preview
+        self.bookmarks.append(bookmark)
+        self._save()
+        return bookmark
+
+    def remove(self, bookmark):
+        self.bookmarks.remove(bookmark)
+        if bookmark.preview is not None:
+            self._previews.pop(bookmark.preview, None)
+            try:
+                os.remove(self._get_preview_path(bookmark.preview))
+            except OSError:
+                pass
+        self._save()
+
+    # Returns the preview of the bookmark as a QImage, or None if there's
+    # none.
+    def get_preview(self, bookmark):
+        if bookmark.preview is None:
+            return None
+        if bookmark.preview not in self._previews:
+            image = QtGui.QImage(self._get_preview_path(bookmark.preview))
+            self._previews[bookmark.preview] = (
+                None if image.isNull() else image
+            )
+        return self._previews[bookmark.preview]
+
+    def _get_preview_path(self, file_name):
+        return os.path.join(self.DIRECTORY, "previews", file_name)
+
+    def _make_dirs(self):
+        for name in ("bookmarks", "previews"):
+            os.makedirs(os.path.join(self.DIRECTORY, name), exist_ok=True)
+
+    def _save(self):
+        self._make_dirs()
+        # written aside first, so that a crash doesn't lose all bookmarks
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as handle:
+            json.dump(
+                {
+                    "bookmarks": [
+                        bookmark.to_dict() for bookmark in self.bookmarks
+                    ]
+                },
+                handle,
+                indent=4,
+            )
+        os.replace(temp_path, self.path)
@@ -0,0 +1,40 @@
+from librgb.reader import Reader
+
+
+# Reads `size` bytes at given address of another reader once and serves
+# them from memory, so that many renders of the same data don't have to go
+# back to the reader. Anything outside of the range reads as NULL bytes.
+class BufferReader(Reader):
+    def __init__(self, reader, address, size):
+        self._start = address
+        self._data = bytes(reader.get_padded_bytes_at(address, size))
+        self._address_text = reader.address_text
+        super(BufferReader, self).__init__()
+
+    def get_padded_bytes_at(self, address, size):
+        start = address - self._start
+        if start >= 0 and start + size <= len(self._data):
+            view = memoryview(self._data)[start : start + size]
+            # QImage needs 32-bit aligned data
+            return view if start % 4 == 0 else view.tobytes()
+
+        result = bytearray(size)
+        chunk_start = max(0, start)
+        chunk_end = min(len(self._data), start + size)
+        if chunk_start < chunk_end:
+            result[chunk_start - start : chunk_end - start] = memoryview(
+                self._data
+            )[chunk_start:chunk_end]
+        return result
+
+    @property
+    def min_address(self):
+        return self._start
+
+    @property
+    def max_address(self):
+        return self._start + len(self._data)
+
+    @property
+    def address_text(self):
+        return self._address_text
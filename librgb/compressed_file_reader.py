@@ -0,0 +1,348 @@
+import bisect
+import json
+import lzma
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from librgb import profiler
+from librgb.file_reader import FileReader, get_file_key
+from librgb.reader import Reader
+
+try:
+    import lz4.frame
+
+    HAS_LZ4 = True
+except ImportError:
+    HAS_LZ4 = False
+
+
+_READ_SIZE = 0x10000
+_INDEX_VERSION = 1
+
+
+def _is_gzip(header):
+    return header[:2] == b"\x1f\x8b"
+
+
+def _is_zlib(header):
+    return (
+        len(header) >= 2
+        and header[0] & 0x0F == 8
+        and (header[0] << 8 | header[1]) % 31 == 0
+    )
+
+
+def _is_xz(header):
+    return header[:6] == b"\xfd7zXZ\x00"
+
+
+def _is_lz4(header):
+    return header[:4] == b"\x04\x22\x4d\x18"
+
+
+def _create_lz4_decompressor():
+    if not HAS_LZ4:
+        raise RuntimeError("LZ4 files require the lz4 module")
+    return lz4.frame.LZ4FrameDecompressor()
+
+
+# name: (detector, decompressor factory)
+_CODECS = OrderedDict(
+    [
+        ("gzip", (_is_gzip, lambda: zlib.decompressobj(zlib.MAX_WBITS | 16))),
+        ("xz", (_is_xz, lzma.LZMADecompressor)),
+        ("lz4", (_is_lz4, _create_lz4_decompressor)),
+        ("zlib", (_is_zlib, zlib.decompressobj)),
+    ]
+)
+
+
+# Returns the name of the compression of given file, or None if it doesn't
+# look compressed.
+def get_compression(path):
+    try:
+        with open(path, "rb") as handle:
+            header = handle.read(8)
+    except OSError:
+        return None
+    for name, (detector, _factory) in _CODECS.items():
+        if detector(header):
+            return name
+    return None
+
+
+# Opens given file with the reader suitable for it.
+def open_file(path, use_mmap=True):
+    if get_compression(path) is not None:
+        return CompressedFileReader(path)
+    return FileReader(path, use_mmap=use_mmap)
+
+
+# Decompresses a single compressed stream sequentially, reading the file in
+# small pieces from `offset` on. The file handle is passed to each read, so
+# that a stream can outlive it.
+class _Stream(object):
+    def __init__(self, offset, decompressor):
+        self.decompressor = decompressor
+        self._input = b""
+        self._input_end = offset
+
+    # Offset of the first compressed byte that wasn't consumed yet. Only
+    # exact for decompressors that don't buffer their input, like zlib's.
+    @property
+    def offset(self):
+        return self._input_end - len(self._input)
+
+    @property
+    def eof(self):
+        return self.decompressor.eof
+
+    # Returns `size` bytes, or fewer if the stream ends.
+    def read(self, handle, size):
+        parts = []
+        while size > 0 and not self.decompressor.eof:
+            if not self._input and getattr(
+                self.decompressor, "needs_input", True
+            ):
+                handle.seek(self._input_end)
+                self._input = handle.read(_READ_SIZE)
+                if not self._input:
+                    # truncated file
+                    break
+                self._input_end += len(self._input)
+            data = self.decompressor.decompress(self._input, size)
+            if self.decompressor.eof:
+                self._input = self.decompressor.unused_data or b""
+            else:
+                self._input = getattr(
+                    self.decompressor, "unconsumed_tail", b""
+                )
+            parts.append(data)
+            size -= len(data)
+        return b"".join(parts)
+
+
+# Reads gzip, zlib, xz or LZ4 compressed files without decompressing them
+# whole. The first open decompresses the file once to build an index of
+# chunks of about CHUNK_SIZE bytes, which is saved beside the file; reads
+# only decompress the chunks they overlap and the most recent chunks are
+# kept around.
+#
+# Decoding can start afresh at the beginning of each compressed stream of
+# the file (gzip members, xz streams, LZ4 frames). Within a stream, gzip and
+# zlib decoding resumes from copies of the decompressor taken at the chunk
+# boundaries; xz and LZ4 decompressors can't be copied, so reads there
+# continue from the last read chunk or decode the stream from its start.
+#
+# The saved index only holds where the chunks are, not the decompressor
+# copies, which can't be saved: restarting a deflate stream in the middle
+# takes inflatePrime(), which Python's zlib lacks. So the saved index only
+# spares files of many streams (e.g. made by pigz --independent or bgzip)
+# from decompressing everything before the read chunk; a file of a single
+# stream reopened with a saved index gets decoded up to the first chunk it
+# reads, taking copies on the way, as if it were xz or LZ4.
+class CompressedFileReader(Reader):
+    CHUNK_SIZE = 4 * 1024 * 1024
+    MAX_CACHED_CHUNKS = 16
+    INDEX_SUFFIX = ".rgbindex"
+
+    def __init__(self, source_path):
+        super(CompressedFileReader, self).__init__()
+        self.path = source_path
+        self.compression = get_compression(source_path)
+        if self.compression is None:
+            raise ValueError("%s is not compressed" % source_path)
+        # [address, offset, starts a stream] of each chunk, followed by the
+        # uncompressed and compressed size of the file
+        self._index = None
+        self._addresses = None
+        # decompressors at the start of chunks, by chunk number
+        self._states = {}
+        # a stream left at the start of a chunk by the last read
+        self._cursor = None
+        self._chunks = OrderedDict()
+        self._lock = threading.Lock()
+        self._content_key = None
+
+    def get_padded_bytes_at(self, address, size):
+        with self._lock:
+            self._load_index()
+            first = max(0, bisect.bisect_right(self._addresses, address) - 1)
+            last = bisect.bisect_right(self._addresses, address + size - 1)
+            chunks = [
+                (self._addresses[idx], self._get_chunk(idx))
+                for idx in range(first, min(last, len(self._index) - 1))
+            ]
+
+        if len(chunks) == 1:
+            start = address - chunks[0][0]
+            data = chunks[0][1]
+            if start >= 0 and start + size <= len(data):
+                view = memoryview(data)[start : start + size]
+                # QImage needs 32-bit aligned data
+                return view if start % 4 == 0 else view.tobytes()
+
+        with profiler.stage("copy"):
+            result = bytearray(size)
+            for chunk_address, data in chunks:
+                start = max(address, chunk_address)
+                end = min(address + size, chunk_address + len(data))
+                if start < end:
+                    result[start - address : end - address] = memoryview(data)[
+                        start - chunk_address : end - chunk_address
+                    ]
+            return result
+
+    @property
+    def min_address(self):
+        return 0
+
+    @property
+    def max_address(self):
+        if self._index is None:
+            with self._lock:
+                self._load_index()
+        return self._index[-1][0]
+
+    @property
+    def content_key(self):
+        if self._content_key is None:
+            self._content_key = get_file_key(self.path)
+        return self._content_key
+
+    @property
+    def address_text(self):
+        return "%s @ %08x" % (self.path, self.address)
+
+    @property
+    def index_path(self):
+        return self.path + self.INDEX_SUFFIX
+
+    def _create_decompressor(self):
+        return _CODECS[self.compression][1]()
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        info = os.stat(self.path)
+        try:
+            with open(self.index_path, "r") as handle:
+                saved = json.load(handle)
+            if (
+                saved["version"] == _INDEX_VERSION
+                and saved["size"] == info.st_size
+                and saved["mtime"] == info.st_mtime
+                and saved["chunk_size"] == self.CHUNK_SIZE
+            ):
+                self._set_index(saved["index"])
+                return
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        with profiler.stage("index"):
+            self._set_index(self._build_index())
+        try:
+            with open(self.index_path, "w") as handle:
+                json.dump(
+                    {
+                        "version": _INDEX_VERSION,
+                        "size": info.st_size,
+                        "mtime": info.st_mtime,
+                        "chunk_size": self.CHUNK_SIZE,
+                        "index": self._index,
+                    },
+                    handle,
+                )
+        except OSError:
+            # e.g. read-only directory; the index gets rebuilt next time
+            print("[librgb] Couldn't save %s" % self.index_path)
+
+    def _set_index(self, index):
+        self._index = index
+        self._addresses = [address for address, _offset, _start in index]
+
+    def _build_index(self):
+        index = []
+        address = 0
+        with open(self.path, "rb") as handle:
+            offset = 0
+            size = handle.seek(0, os.SEEK_END)
+            while offset < size:
+                stream = _Stream(offset, self._create_decompressor())
+                index.append([address, offset, True])
+                while True:
+                    address += len(stream.read(handle, self.CHUNK_SIZE))
+                    if stream.eof or address - index[-1][0] < self.CHUNK_SIZE:
+                        break
+                    if hasattr(stream.decompressor, "copy"):
+                        self._states[len(index)] = stream.decompressor.copy()
+                    index.append([address, stream.offset, False])
+                if not index[-1][2] and index[-1][0] == address:
+                    # the stream ended right at a chunk boundary
+                    self._states.pop(len(index) - 1, None)
+                    index.pop()
+                if not stream.eof:
+                    break
+                offset = self._find_next_stream(handle, stream.offset)
+            index.append([address, size, True])
+        return index
+
+    # Skips the padding after a stream; returns the end of the file unless
+    # another stream follows.
+    def _find_next_stream(self, handle, offset):
+        handle.seek(offset)
+        while True:
+            data = handle.read(_READ_SIZE)
+            header = data.lstrip(b"\x00")
+            if not data:
+                return offset
+            if header:
+                offset += len(data) - len(header)
+                header += handle.read(8)
+                if _CODECS[self.compression][0](header):
+                    return offset
+                return handle.seek(0, os.SEEK_END)
+            offset += len(data)
+
+    def _get_chunk(self, idx):
+        if idx in self._chunks:
+            self._chunks.move_to_end(idx)
+            return self._chunks[idx]
+
+        first, stream = self._resume(idx)
+        with profiler.stage("decompress"), open(self.path, "rb") as handle:
+            for current in range(first, idx + 1):
+                address, offset, is_start = self._index[current]
+                if current > first:
+                    if is_start:
+                        stream = _Stream(offset, self._create_decompressor())
+                    elif hasattr(stream.decompressor, "copy"):
+                        self._states[current] = stream.decompressor.copy()
+                data = stream.read(
+                    handle, self._index[current + 1][0] - address
+                )
+                self._chunks[current] = data
+                self._chunks.move_to_end(current)
+                while len(self._chunks) > self.MAX_CACHED_CHUNKS:
+                    self._chunks.popitem(last=False)
+        if idx + 1 < len(self._index) - 1:
+            self._cursor = (idx + 1, stream)
+        return data
+
+    # Returns the first chunk to decode to get to given chunk and a stream
+    # positioned at its start.
+    def _resume(self, idx):
+        first = idx
+        while not self._index[first][2] and first not in self._states:
+            first -= 1
+        if self._cursor is not None and first < self._cursor[0] <= idx:
+            cursor, self._cursor = self._cursor, None
+            return cursor
+        self._cursor = None
+
+        _address, offset, is_start = self._index[first]
+        if is_start:
+            return first, _Stream(offset, self._create_decompressor())
+        return first, _Stream(offset, self._states[first].copy())
@@ -0,0 +1,155 @@
+from librgb import yuv_decoder
+from librgb.buffer_reader import BufferReader
+from librgb.pixel_formats import PixelFormats
+from librgb.qt_shims import QtCore, QtGui, QtWidgets
+from librgb.render_worker import RenderJob
+from librgb.renderer import Renderer
+
+
+# Renders an image with a renderer, or only its first `rows` rows, and
+# scales it down to a thumbnail, still on the worker thread.
+class _Thumbnail(object):
+    def __init__(self, renderer, size, rows=None):
+        self.renderer = renderer
+        self.size = size
+        self.rows = rows
+
+    def get_image(self, is_cancelled=None):
+        try:
+            if self.rows is None:
+                image = self.renderer.get_image(is_cancelled)
+            else:
+                image = self.renderer.get_tile(
+                    0, 0, self.renderer.width, self.rows, is_cancelled
+                )
+        except RuntimeError:
+            # e.g. formats that require numpy
+            return QtGui.QImage()
+        if image is None or image.isNull():
+            return image
+        # scaled() shares the pixels when the size is right already, and
+        # those may be a buffer that's gone once the image is
+        return image.scaled(
+            self.size,
+            self.size,
+            QtCore.Qt.KeepAspectRatio,
+            QtCore.Qt.SmoothTransformation,
+        ).copy()
+
+
+# Shows the data at the current address as a grid of thumbnails, one for
+# every pixel format or for a range of widths around the current one. The
+# bytes are read once and shared by all the cells, which get rendered in
+# parallel. Clicking a cell passes its format and width to the callback.
+class ContactSheetView(QtWidgets.QWidget):
+    FORMATS = "formats"
+    WIDTHS = "widths"
+    THUMBNAIL_SIZE = 160
+    WIDTH_RANGE = 12
+    # cells of larger canvases only show their top part
+    MAX_CELL_CANVAS_SIZE = 1024 * 1024
+
+    def __init__(self, callback, parent=None):
+        super(ContactSheetView, self).__init__(parent)
+        self.callback = callback
+        self._layout = QtWidgets.QGridLayout()
+        self._layout.setAlignment(QtCore.Qt.AlignTop | QtCore.Qt.AlignLeft)
+        self.setLayout(self._layout)
+        self._pool = QtCore.QThreadPool()
+        self._pool.setMaxThreadCount(max(1, QtCore.QThread.idealThreadCount()))
+        self._jobs = []
+
+    def show_cells(self, params, mode, columns):
+        self.clear()
+        if params.reader is None:
+            return
+
+        if mode == self.FORMATS:
+            cells = [
+                (pixel_format, params.width, name)
+                for pixel_format, name in PixelFormats.get_short_names().items()
+            ]
+        else:
+            cells = [
+                (params.format, width, str(width))
+                for width in range(
+                    max(1, params.width - self.WIDTH_RANGE),
+                    params.width + self.WIDTH_RANGE + 1,
+                )
+            ]
+
+        def get_height(width):
+            return max(
+                1, min(params.height, self.MAX_CELL_CANVAS_SIZE // width)
+            )
+
+        # planar YUV cells read what they need from the reader itself
+        reader = BufferReader(
+            params.reader,
+            params.reader.address,
+            max(
+                [
+                    Renderer.get_stride(
+                        pixel_format, width, params.row_alignment
+                    )
+                    * get_height(width)
+                    for pixel_format, width, _name in cells
+                    if not yuv_decoder.is_planar_format(pixel_format)
+                ],
+                default=0,
+            ),
+        )
+        for idx, (pixel_format, width, name) in enumerate(cells):
+            button = QtWidgets.QToolButton()
+            button.setToolButtonStyle(QtCore.Qt.ToolButtonTextUnderIcon)
+            button.setIconSize(
+                QtCore.QSize(self.THUMBNAIL_SIZE, self.THUMBNAIL_SIZE)
+            )
+            button.setText(name)
+            button.clicked.connect(
+                lambda _checked=False, pixel_format=pixel_format, width=width: (
+                    self.callback(pixel_format, width)
+                )
+            )
+            self._layout.addWidget(button, idx // columns, idx % columns)
+
+            cell_params = params.copy()
+            cell_params.format = pixel_format
+            cell_params.width = width
+            cell_params.palette_reader = params.palette_reader or params.reader
+            cell_params.diff_reader = None
+            if yuv_decoder.is_planar_format(pixel_format):
+                # the chroma planes start after the whole luma plane, so
+                # the image keeps its height and only its top gets rendered
+                cell_params.readers = [params.reader]
+                rows = get_height(width)
+            else:
+                cell_params.readers = [reader]
+                cell_params.height = get_height(width)
+                rows = None
+
+            job = RenderJob(
+                _Thumbnail(Renderer(cell_params), self.THUMBNAIL_SIZE, rows)
+            )
+            job.signals.finished.connect(
+                lambda image, job=job, button=button: self._cell_rendered(
+                    job, button, image
+                )
+            )
+            self._jobs.append(job)
+            self._pool.start(job)
+
+    def clear(self):
+        for job in self._jobs:
+            job.cancel()
+        self._jobs = []
+        while self._layout.count():
+            self._layout.takeAt(0).widget().setParent(None)
+
+    def _cell_rendered(self, job, button, image):
+        if job not in self._jobs:
+            return
+        if image.isNull():
+            button.setText(button.text() + " (n/a)")
+            return
+        button.setIcon(QtGui.QIcon(QtGui.QPixmap.fromImage(image)))
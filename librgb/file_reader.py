@@ -1,32 +1,163 @@
+import hashlib
+import mmap
 import os
+import stat
+import threading
+from collections import OrderedDict
 
-from librgb.reader import Reader
+from librgb import profiler
+from librgb.reader import Reader, gather_strided
+
+
+# Files are mapped on first read and only the most recently read ones stay
+# mapped, so that browsing thousands of files doesn't run out of file
+# descriptors. Shared by all readers, including those of worker threads.
+class _MapPool(object):
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._maps = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Returns a view of given range of the mapped file, or None if the file
+    # can't be mapped. The view is taken under the lock, so the mapping
+    # can't get closed in the meantime. The range is cut at the start of
+    # the file rather than counted from its end.
+    def get_view(self, path, start, end):
+        with self._lock:
+            if path in self._maps:
+                self._maps.move_to_end(path)
+            else:
+                self._maps[path] = self._map(path)
+                while len(self._maps) > self.max_size:
+                    self._close(self._maps.popitem(last=False)[1])
+            mapping = self._maps[path]
+            if mapping is None:
+                return None
+            return memoryview(mapping)[max(0, start) : max(0, end)]
+
+    @staticmethod
+    def _map(path):
+        with open(path, "rb") as handle:
+            try:
+                return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError, OverflowError):
+                # e.g. empty or special files or >2 GB files on 32-bit Python
+                return None
+
+    @staticmethod
+    def _close(mapping):
+        if mapping is None:
+            return
+        try:
+            mapping.close()
+        except BufferError:
+            # still viewed by a frame; it gets unmapped along with the views
+            pass
+
+
+_maps = _MapPool(64)
+
+_KEY_SAMPLES = 16
+_KEY_SAMPLE_SIZE = 0x10000
+
+
+# Identifies the contents of a file from its size and a few samples spread
+# over it, so that large dumps don't have to be read whole.
+def get_file_key(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as handle:
+        size = handle.seek(0, os.SEEK_END)
+        digest.update(str(size).encode())
+        for idx in range(_KEY_SAMPLES):
+            handle.seek(size * idx // _KEY_SAMPLES)
+            digest.update(handle.read(_KEY_SAMPLE_SIZE))
+    return digest.hexdigest()
 
 
 class FileReader(Reader):
-    def __init__(self, source_path):
+    def __init__(self, source_path, use_mmap=True):
         super(FileReader, self).__init__()
         self.path = source_path
-        with open(source_path, "rb") as handle:
-            handle.seek(0, os.SEEK_END)
-            self._max_address = handle.tell()
-            handle.seek(0, os.SEEK_SET)
-
-    def get_padded_bytes(self, size):
-        with open(self.path, "rb") as handle:
-            handle.seek(self.address)
-            data = handle.read(size)
-            data += b"\x00" * (size - len(data))
+        self.use_mmap = use_mmap
+        self._max_address = None
+        self._content_key = None
+
+    def get_padded_bytes_at(self, address, size):
+        if address < 0:
+            # NULL bytes before the start of the file
+            skipped = min(size, -address)
+            result = bytearray(size)
+            result[skipped:] = self.get_padded_bytes_at(0, size - skipped)
+            return result
+
+        data = None
+        if self.use_mmap:
+            data = _maps.get_view(self.path, address, address + size)
+        if data is None:
+            with profiler.stage("io"), open(self.path, "rb") as handle:
+                handle.seek(address)
+                data = handle.read(size)
+                data += b"\x00" * (size - len(data))
+                return data
+
+        # Zero-copy view into the page cache; only the tail gets padded.
+        # QImage needs 32-bit aligned data, so unaligned views get copied.
+        if len(data) == size and address % 4 == 0:
             return data
+        with profiler.stage("copy"):
+            if len(data) == size:
+                return data.tobytes()
+            padded = bytearray(size)
+            padded[: len(data)] = data
+            return padded
+
+    # Copies the pieces out of a single view of the range they span, or
+    # reads them one by one with a single open().
+    def get_padded_strided_bytes_at(self, address, size, stride, count):
+        if address < 0:
+            return super(FileReader, self).get_padded_strided_bytes_at(
+                address, size, stride, count
+            )
+
+        data = None
+        if self.use_mmap:
+            data = _maps.get_view(
+                self.path, address, address + (count - 1) * stride + size
+            )
+        if data is not None:
+            with profiler.stage("copy"):
+                return gather_strided(data, size, stride, count)
+
+        result = bytearray(size * count)
+        with profiler.stage("io"), open(self.path, "rb") as handle:
+            for idx in range(count):
+                handle.seek(address + idx * stride)
+                chunk = handle.read(size)
+                result[idx * size : idx * size + len(chunk)] = chunk
+        return result
 
     @property
     def min_address(self):
         return 0
 
+    # Measured on first use, without opening the file unless it's a device.
     @property
     def max_address(self):
+        if self._max_address is None:
+            info = os.stat(self.path)
+            if stat.S_ISREG(info.st_mode):
+                self._max_address = info.st_size
+            else:
+                with open(self.path, "rb") as handle:
+                    self._max_address = handle.seek(0, os.SEEK_END)
         return self._max_address
 
+    @property
+    def content_key(self):
+        if self._content_key is None:
+            self._content_key = get_file_key(self.path)
+        return self._content_key
+
     @property
     def address_text(self):
         return "%s @ %08x" % (self.path, self.address)
@@ -0,0 +1,135 @@
+import collections
+import threading
+import zlib
+
+try:
+    import numpy
+
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+_MAX_CACHED_HASHES = 16
+_hashes = collections.OrderedDict()
+_hashes_lock = threading.Lock()
+
+_MAX_DESCRIBED_BLOCKS = 3
+
+
+def _get_heat_colors():
+    # black for unchanged pixels, then from dark red over yellow to white
+    colors = [0xFF000000]
+    for value in range(1, 0x100):
+        level = 0x40 + (value - 1) * 0x2BF // 0xFE
+        red = min(level, 0xFF)
+        green = min(max(level - 0x100, 0), 0xFF)
+        blue = min(max(level - 0x200, 0), 0xFF)
+        colors.append(0xFF000000 | (red << 16) | (green << 8) | blue)
+    return colors
+
+
+HEAT_COLORS = _get_heat_colors()
+
+
+def _hash_rows(data, stride, height):
+    view = memoryview(data)
+    return [
+        zlib.crc32(view[y * stride : (y + 1) * stride]) for y in range(height)
+    ]
+
+
+# Hashes of the rows of a reader that's compared against, which rarely
+# changes between renders; the key must identify the data.
+def _get_cached_row_hashes(key, data, stride, height):
+    with _hashes_lock:
+        if key in _hashes:
+            _hashes.move_to_end(key)
+            return _hashes[key]
+
+    hashes = _hash_rows(data, stride, height)
+    with _hashes_lock:
+        _hashes[key] = hashes
+        if len(_hashes) > _MAX_CACHED_HASHES:
+            _hashes.popitem(last=False)
+    return hashes
+
+
+# Tells which rows differ by comparing hashes of them rather than the rows
+# themselves. `reference_key` identifies the reference data for caching.
+def get_changed_rows(data, reference, reference_key, stride, height):
+    reference_hashes = _get_cached_row_hashes(
+        reference_key, reference, stride, height
+    )
+    return [
+        current != previous
+        for current, previous in zip(
+            _hash_rows(data, stride, height), reference_hashes
+        )
+    ]
+
+
+# Returns the largest absolute difference of the bytes of each pixel of the
+# changed rows, as a (height, width) array. Pixels start at `x`; pixels
+# smaller than a byte get the difference of their byte.
+def get_heatmap(data, reference, changed, stride, bits, x, width):
+    if not HAS_NUMPY:
+        raise RuntimeError("Diff mode requires numpy")
+
+    height = len(changed)
+    heat = numpy.zeros((height, width), dtype=numpy.uint8)
+    rows = numpy.flatnonzero(changed)
+    if not len(rows):
+        return heat
+
+    start = x * bits // 8
+    end = min(stride, ((x + width) * bits + 7) // 8)
+    if end <= start:
+        return heat
+    current = numpy.frombuffer(data, dtype=numpy.uint8)
+    current = current[: stride * height].reshape(height, stride)
+    previous = numpy.frombuffer(reference, dtype=numpy.uint8)
+    previous = previous[: stride * height].reshape(height, stride)
+    diff = numpy.abs(
+        current[rows, start:end].astype(numpy.int16)
+        - previous[rows, start:end]
+    ).astype(numpy.uint8)
+    offsets = numpy.arange(x, x + width) * bits // 8 - start
+    heat[rows] = numpy.maximum.reduceat(
+        diff, numpy.minimum(offsets, end - start - 1), axis=1
+    )
+    return heat
+
+
+# Summarizes the changes as runs of changed rows, with the columns each run
+# spans, e.g. "12 rows changed: 10-19 x 4-100, 40 x 7".
+def describe_changes(heat, changed):
+    blocks = []
+    for y, is_changed in enumerate(changed):
+        if not is_changed:
+            continue
+        if blocks and blocks[-1][1] == y - 1:
+            blocks[-1][1] = y
+        else:
+            blocks.append([y, y])
+    if not blocks:
+        return "no changes"
+
+    def describe_range(first, last):
+        if first == last:
+            return "%d" % first
+        return "%d-%d" % (first, last)
+
+    parts = []
+    for first, last in blocks[:_MAX_DESCRIBED_BLOCKS]:
+        part = describe_range(first, last)
+        columns = numpy.flatnonzero(heat[first : last + 1].any(axis=0))
+        if len(columns):
+            part += " x " + describe_range(columns[0], columns[-1])
+        parts.append(part)
+    if len(blocks) > _MAX_DESCRIBED_BLOCKS:
+        parts.append("...")
+    return "%d rows changed: %s" % (
+        sum(last - first + 1 for first, last in blocks),
+        ", ".join(parts),
+    )
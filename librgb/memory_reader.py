@@ -1,4 +1,9 @@
+import threading
+from collections import OrderedDict
+
+from librgb import profiler
 from librgb.reader import Reader
+from librgb.segment_index import SegmentIndex
 
 # Avoid complaints from __init__.py for CLI
 try:
@@ -8,16 +13,55 @@ except ImportError:
     pass
 
 
-class MemoryRange(object):
-    def __init__(self, start, end):
-        self.start = start
-        self.end = end
+_BLOCK_SIZE = 0x10000
+_MAX_CACHED_BLOCKS = 1024
+
+
+# Bumped by IDA event hooks; readers compare them against the values their
+# caches were built with.
+class _Generations(object):
+    segments = 0
+    memory = 0
+    hooks = None
+
+
+def _install_hooks():
+    if _Generations.hooks is not None:
+        return
 
-    def length(self):
-        return self.end - self.start
+    def segments_changed(*_args):
+        _Generations.segments += 1
+        _Generations.memory += 1
+        return 0
 
-    def __str__(self):
-        return "start: %08x end: %08x" % (self.start, self.end)
+    def memory_changed(*_args):
+        _Generations.memory += 1
+        return 0
+
+    class IdbHooks(idaapi.IDB_Hooks):
+        segm_added = segments_changed
+        segm_deleted = segments_changed
+        segm_start_changed = segments_changed
+        segm_end_changed = segments_changed
+        segm_moved = segments_changed
+        byte_patched = memory_changed
+
+    class DbgHooks(idaapi.DBG_Hooks):
+        dbg_process_start = memory_changed
+        dbg_process_attach = memory_changed
+        dbg_process_exit = memory_changed
+        dbg_process_detach = memory_changed
+        dbg_suspend_process = memory_changed
+        dbg_exception = memory_changed
+        dbg_bpt = memory_changed
+        dbg_step_into = memory_changed
+        dbg_step_over = memory_changed
+        dbg_step_until_ret = memory_changed
+        dbg_run_to = memory_changed
+
+    _Generations.hooks = (IdbHooks(), DbgHooks())
+    for hooks in _Generations.hooks:
+        hooks.hook()
 
 
 # Reads continuous memory chunk even if it spans accross multiple segments.
@@ -25,68 +69,108 @@ class MemoryRange(object):
 class MemoryReader(Reader):
     def __init__(self):
         super(MemoryReader, self).__init__()
+        self._segments = None
+        self._segments_generation = None
+        self._blocks = OrderedDict()
+        self._blocks_generation = None
+        _install_hooks()
+
+    def get_padded_bytes_at(self, address, size):
+        # IDA API may only be used from the main thread
+        if threading.current_thread() is threading.main_thread():
+            return self._read(address, size)
+
+        result = []
+
+        def read():
+            result.append(self._read(address, size))
+            return 0
+
+        with profiler.stage("sync"):
+            idaapi.execute_sync(read, idaapi.MFF_READ)
+        return result[0]
+
+    def _read(self, start, size):
+        result = bytearray(size)
+        end = start + size
+
+        block_start = start - start % _BLOCK_SIZE
+        while block_start < end:
+            block = self._get_block(block_start)
+            if block is not None:
+                chunk_start = max(start, block_start)
+                chunk_end = min(end, block_start + _BLOCK_SIZE)
+                result[chunk_start - start : chunk_end - start] = memoryview(
+                    block
+                )[chunk_start - block_start : chunk_end - block_start]
+            block_start += _BLOCK_SIZE
 
-    def get_padded_bytes(self, size):
-        result = b"\x00" * size
-        ranges_left = [MemoryRange(self.address, self.address + size)]
-
-        segment_count = idaapi.get_segm_qty()
-        valid_memory_ranges = []
-        for i in range(segment_count):
-            segment = idaapi.getnseg(i)
-            # Skip segments with unstable data
-            if segment.type == idaapi.SEG_XTRN:
-                continue
-            valid_memory_ranges.append(
-                MemoryRange(segment.start_ea, segment.end_ea)
-            )
-
-        while len(ranges_left) > 0:
-            # Get a requested memory range and remove it from the list
-            current_range = ranges_left.pop()
-
-            intersection = None
-            for memory_range in valid_memory_ranges:
-                start = max(current_range.start, memory_range.start)
-                end = min(current_range.end, memory_range.end)
-                if end > start:
-                    intersection = MemoryRange(start, end)
-                    break
-
-            # No segment can satisfy any part of requested range
-            if intersection is None:
-                continue
+        return result
 
-            chunk = idc.get_bytes(
-                intersection.start, intersection.end - intersection.start
-            )
+    def _get_segments(self):
+        if (
+            self._segments is None
+            or self._segments_generation != _Generations.segments
+        ):
+            ranges = []
+            for i in range(idaapi.get_segm_qty()):
+                segment = idaapi.getnseg(i)
+                # Skip segments with unstable data
+                if segment.type == idaapi.SEG_XTRN:
+                    continue
+                ranges.append((segment.start_ea, segment.end_ea))
+            self._segments = SegmentIndex(ranges)
+            self._segments_generation = _Generations.segments
+        return self._segments
+
+    def _get_block(self, block_start):
+        # Memory of a running process changes behind our back.
+        if idaapi.get_process_state() == idaapi.DSTATE_RUN:
+            return self._read_block(block_start)
+
+        if self._blocks_generation != _Generations.memory:
+            self._blocks.clear()
+            self._blocks_generation = _Generations.memory
+
+        if block_start in self._blocks:
+            self._blocks.move_to_end(block_start)
+            return self._blocks[block_start]
+
+        block = self._read_block(block_start)
+        self._blocks[block_start] = block
+        if len(self._blocks) > _MAX_CACHED_BLOCKS:
+            self._blocks.popitem(last=False)
+        return block
+
+    def _read_block(self, block_start):
+        with profiler.stage("fetch"):
+            return self._fetch_block(block_start)
+
+    def _fetch_block(self, block_start):
+        block = None
+        for start, end in self._get_segments().intersect(
+            block_start, block_start + _BLOCK_SIZE
+        ):
+            chunk = idc.get_bytes(start, end - start)
             if chunk is None:
                 print(
                     "[librgb] Some bytes are unreadable in %s..%s"
-                    % (
-                        idc.atoa(intersection.start),
-                        idc.atoa(intersection.end),
-                    )
+                    % (idc.atoa(start), idc.atoa(end))
                 )
                 continue
+            if block is None:
+                block = bytearray(_BLOCK_SIZE)
+            block[start - block_start : end - block_start] = chunk
+        return block
 
-            result = (
-                result[0 : intersection.start - self.address]
-                + chunk
-                + result[intersection.end - self.address :]
-            )
-            assert len(result) == size
-
-            # If necessary, enqueue ranges unsatisfied by chosen mem segment
-            range1 = MemoryRange(current_range.start, intersection.start)
-            range2 = MemoryRange(intersection.end, current_range.end)
-            if range1.length() > 0:
-                ranges_left.append(range1)
-            if range2.length() > 0:
-                ranges_left.append(range2)
-
-        assert len(result) == size
-        return result
+    def refresh(self):
+        return idaapi.get_process_state() == idaapi.DSTATE_RUN
+
+    @property
+    def version(self):
+        if idaapi.get_process_state() == idaapi.DSTATE_RUN:
+            return object()
+        return _Generations.memory
 
     @property
     def min_address(self):
@@ -96,6 +180,16 @@ class MemoryReader(Reader):
     def max_address(self):
         return idaapi.cvar.inf.maxEA
 
+    # The same for every IDB of the same input file.
+    @property
+    def content_key(self):
+        md5 = idaapi.retrieve_input_file_md5()
+        if not md5:
+            return None
+        if not isinstance(md5, str):
+            md5 = "".join("%02x" % byte for byte in bytearray(md5))
+        return "idb-" + md5.lower()
+
     @property
     def address_text(self):
         return idc.atoa(self.address)
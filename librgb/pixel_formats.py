@@ -20,6 +20,29 @@ class PixelFormats(object):
     RGBA8888i = 231
     RGBA8888x = 232
 
+    INDEXED2MSB = 300
+    INDEXED2LSB = 301
+    INDEXED4MSB = 310
+    INDEXED4LSB = 311
+    INDEXED8 = 320
+
+    DXT1 = 400
+    DXT5 = 410
+    ETC1 = 420
+
+    NV12 = 500
+    I420 = 510
+    YUYV = 520
+    UYVY = 530
+
+    GRAY2 = 600
+    GRAY4 = 610
+    GRAY12 = 620
+    GRAY16 = 630
+    RGBA4444 = 640
+    ARGB1555 = 650
+    RGB10A2 = 660
+
     _NAME_MAP = [
         (GRAY1MSB, "1:Binary (1, MSB)", "G1<"),
         (GRAY1LSB, "1:Binary (1, LSB)", "G1>"),
@@ -36,6 +59,25 @@ class PixelFormats(object):
         (RGBA8888, "32:RGBA (8-8-8-8)", "RGBA8888"),
         (RGBA8888i, "32:RGBa (8-8-8-8)", "RGBa8888"),
         (RGBA8888x, "32:RGBx (8-8-8-8)", "RGBx8888"),
+        (INDEXED2MSB, "2:Indexed (2, MSB)", "I2<"),
+        (INDEXED2LSB, "2:Indexed (2, LSB)", "I2>"),
+        (INDEXED4MSB, "4:Indexed (4, MSB)", "I4<"),
+        (INDEXED4LSB, "4:Indexed (4, LSB)", "I4>"),
+        (INDEXED8, "8:Indexed (8)", "I8"),
+        (DXT1, "4:DXT1 (BC1)", "DXT1"),
+        (DXT5, "8:DXT5 (BC3)", "DXT5"),
+        (ETC1, "4:ETC1", "ETC1"),
+        (NV12, "12:YUV 4:2:0 (NV12)", "NV12"),
+        (I420, "12:YUV 4:2:0 (I420)", "I420"),
+        (YUYV, "16:YUV 4:2:2 (YUYV)", "YUYV"),
+        (UYVY, "16:YUV 4:2:2 (UYVY)", "UYVY"),
+        (GRAY2, "2:Grayscale (2)", "G2"),
+        (GRAY4, "4:Grayscale (4)", "G4"),
+        (GRAY12, "12:Grayscale (12)", "G12"),
+        (GRAY16, "16:Grayscale (16)", "G16"),
+        (RGBA4444, "16:RGBA (4-4-4-4)", "RGBA4444"),
+        (ARGB1555, "16:ARGB (1-5-5-5)", "ARGB1555"),
+        (RGB10A2, "32:RGBA (10-10-10-2)", "RGB10A2"),
     ]
 
     @staticmethod
@@ -0,0 +1,145 @@
+import threading
+from collections import OrderedDict
+
+from librgb.reader import Reader, gather_strided
+
+_MAX_CACHED_BYTES = 0x4000000
+
+
+# Wraps another reader, reading the windows right before and after the shown
+# one on a background thread so that paging through the data gets served
+# from memory. Prefetched spans are dropped as soon as the version of the
+# wrapped reader changes.
+class PrefetchingReader(Reader):
+    def __init__(self, reader):
+        self.reader = reader
+        super(PrefetchingReader, self).__init__()
+        self._spans = OrderedDict()
+        self._cached_bytes = 0
+        self._version = None
+        self._requests = []
+        self._condition = threading.Condition()
+        self._thread = None
+
+    # Renderers ask for it on the main thread before reading anything, which
+    # makes it the place to notice that the spans went stale.
+    @property
+    def version(self):
+        version = self.reader.version
+        with self._condition:
+            if version != self._version:
+                self._spans.clear()
+                self._cached_bytes = 0
+                self._requests = []
+                self._version = version
+        return version
+
+    def get_padded_bytes_at(self, address, size):
+        with self._condition:
+            span = self._find_span(address, size)
+            if span is not None:
+                self._spans.move_to_end(span)
+                data = self._spans[span]
+        if span is None:
+            return self.reader.get_padded_bytes_at(address, size)
+
+        offset = address - span[0]
+        view = memoryview(data)[offset : offset + size]
+        # QImage needs 32-bit aligned data
+        return view if offset % 4 == 0 else view.tobytes()
+
+    def get_padded_strided_bytes_at(self, address, size, stride, count):
+        span_size = (count - 1) * stride + size
+        with self._condition:
+            span = self._find_span(address, span_size)
+            if span is not None:
+                self._spans.move_to_end(span)
+                data = self._spans[span]
+        if span is None:
+            return self.reader.get_padded_strided_bytes_at(
+                address, size, stride, count
+            )
+
+        offset = address - span[0]
+        return gather_strided(
+            memoryview(data)[offset : offset + span_size], size, stride, count
+        )
+
+    def prefetch(self, address, size):
+        if not size or size * 2 > _MAX_CACHED_BYTES:
+            return
+        version = self.version
+        requests = []
+        for start in (address + size, address - size):
+            # cut to the data, which is all there is to read
+            end = min(start + size, self.max_address)
+            start = max(start, self.min_address)
+            if start < end:
+                requests.append((start, end - start, version))
+        with self._condition:
+            self._requests = requests
+            self._condition.notify()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="librgb prefetch"
+                )
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _find_span(self, address, size):
+        for start, end in self._spans:
+            if start <= address and address + size <= end:
+                return start, end
+        return None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._requests:
+                    self._condition.wait()
+                start, size, version = self._requests.pop(0)
+                if (
+                    version != self._version
+                    or self._find_span(start, size) is not None
+                ):
+                    continue
+
+            data = bytes(self.reader.get_padded_bytes_at(start, size))
+
+            with self._condition:
+                if version != self._version:
+                    continue
+                self._spans[start, start + size] = data
+                self._cached_bytes += size
+                while self._cached_bytes > _MAX_CACHED_BYTES:
+                    (old_start, old_end), _data = self._spans.popitem(
+                        last=False
+                    )
+                    self._cached_bytes -= old_end - old_start
+
+    def refresh(self):
+        return self.reader.refresh()
+
+    @property
+    def min_address(self):
+        return self.reader.min_address
+
+    @property
+    def max_address(self):
+        return self.reader.max_address
+
+    @property
+    def address(self):
+        return self.reader.address
+
+    @address.setter
+    def address(self, address):
+        self.reader.address = address
+
+    @property
+    def content_key(self):
+        return self.reader.content_key
+
+    @property
+    def address_text(self):
+        return self.reader.address_text
@@ -0,0 +1,397 @@
+import array
+import bisect
+import ctypes
+import errno
+import functools
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from librgb import profiler
+from librgb.reader import Reader
+from librgb.segment_index import SegmentIndex
+
+_PAGE_SIZE = mmap.PAGESIZE
+_MAX_CACHED_PAGES = 0x4000
+_IOV_MAX = 1024
+_SOFT_DIRTY_BIT = 1 << 55
+
+
+class _IoVec(ctypes.Structure):
+    _fields_ = [("base", ctypes.c_void_p), ("size", ctypes.c_size_t)]
+
+
+def _get_process_vm_readv():
+    try:
+        func = ctypes.CDLL(None, use_errno=True).process_vm_readv
+    except (OSError, AttributeError, TypeError):
+        # not Linux, or too old libc
+        return None
+    func.restype = ctypes.c_ssize_t
+    func.argtypes = [
+        ctypes.c_int,
+        ctypes.POINTER(_IoVec),
+        ctypes.c_ulong,
+        ctypes.POINTER(_IoVec),
+        ctypes.c_ulong,
+        ctypes.c_ulong,
+    ]
+    return func
+
+
+_process_vm_readv = _get_process_vm_readv()
+
+
+def _read_pagemap(fd, first_page, count):
+    entries = array.array("Q")
+    entries.frombytes(
+        os.pread(fd, count * entries.itemsize, first_page * entries.itemsize)
+    )
+    return entries
+
+
+# Splits sorted page addresses into runs of consecutive pages.
+def _get_runs(pages):
+    run = []
+    for page in pages:
+        if run and page != run[-1] + _PAGE_SIZE:
+            yield run
+            run = []
+        run.append(page)
+    if run:
+        yield run
+
+
+# Tells whether the kernel tracks soft-dirty pages (CONFIG_MEM_SOFT_DIRTY),
+# by dirtying a page of our own after clearing the bits.
+@functools.lru_cache(maxsize=1)
+def _has_soft_dirty():
+    page = mmap.mmap(-1, _PAGE_SIZE)
+    try:
+        buffer = ctypes.c_char.from_buffer(page)
+        address = ctypes.addressof(buffer)
+        del buffer
+        with open("/proc/self/clear_refs", "w") as handle:
+            handle.write("4")
+        page[0] = 1
+        fd = os.open("/proc/self/pagemap", os.O_RDONLY)
+        try:
+            entry = _read_pagemap(fd, address // _PAGE_SIZE, 1)[0]
+        finally:
+            os.close(fd)
+        return bool(entry & _SOFT_DIRTY_BIT)
+    except (OSError, IndexError):
+        return False
+    finally:
+        page.close()
+
+
+# Reads the memory of a running Linux process, using the readable mappings
+# of /proc/PID/maps as its segments. Pages are read in batches with
+# process_vm_readv(), falling back to /proc/PID/mem, and kept until
+# refresh() finds them modified; that relies on the soft-dirty bits of
+# /proc/PID/pagemap where the kernel has them. Without them, refresh() reads
+# the pages read since the previous refresh again and compares them with
+# the kept ones, and drops the others.
+#
+# Clearing the soft-dirty bits and reading them can't be done atomically,
+# so a page written in between goes unnoticed; everything gets re-read
+# every FULL_REFRESH_INTERVAL seconds to make up for it. New mappings are
+# picked up at the same interval.
+class ProcessReader(Reader):
+    FULL_REFRESH_INTERVAL = 1.0
+
+    def __init__(self, pid):
+        self.pid = pid
+        self._lock = threading.Lock()
+        self._mem = os.open("/proc/%d/mem" % pid, os.O_RDONLY)
+        self._pagemap = None
+        self._use_process_vm_readv = _process_vm_readv is not None
+        self._use_soft_dirty = _has_soft_dirty()
+        self._maps = []
+        self._segments = None
+        self._pages = OrderedDict()
+        # pages read since the previous refresh, and those read before it
+        self._read_pages = set()
+        self._shown_pages = set()
+        self._generation = 0
+        self._last_full_refresh = None
+        self._unreadable = set()
+        self._full_refresh()
+        super(ProcessReader, self).__init__()
+
+    def get_padded_bytes_at(self, address, size):
+        return self._read_pieces_at(address, size, size, 1)
+
+    def get_padded_strided_bytes_at(self, address, size, stride, count):
+        return self._read_pieces_at(address, size, stride, count)
+
+    # Fetches the missing pages of all pieces in one go, then copies them.
+    def _read_pieces_at(self, address, size, stride, count):
+        result = bytearray(size * count)
+        starts = [address + idx * stride for idx in range(count)]
+        with self._lock:
+            missing = set()
+            for start in starts:
+                first_page = start - start % _PAGE_SIZE
+                missing.update(
+                    page
+                    for page in range(
+                        max(0, first_page), start + size, _PAGE_SIZE
+                    )
+                    if page not in self._pages
+                )
+            self._fetch_pages(sorted(missing))
+            for idx, start in enumerate(starts):
+                self._copy_pages(result, idx * size, start, size)
+            while len(self._pages) > _MAX_CACHED_PAGES:
+                self._pages.popitem(last=False)
+        return result
+
+    def _copy_pages(self, result, offset, address, size):
+        end = address + size
+        first_page = address - address % _PAGE_SIZE
+        for page in range(max(0, first_page), end, _PAGE_SIZE):
+            data = self._pages.get(page)
+            if data is None:
+                continue
+            self._pages.move_to_end(page)
+            if not self._use_soft_dirty:
+                self._read_pages.add(page)
+            chunk_start = max(address, page)
+            chunk_end = min(end, page + _PAGE_SIZE)
+            result[
+                offset + chunk_start - address : offset + chunk_end - address
+            ] = data[chunk_start - page : chunk_end - page]
+
+    # Drops the pages that were modified since the previous refresh; returns
+    # whether there were any.
+    def refresh(self):
+        with self._lock:
+            if not self._use_soft_dirty:
+                return self._compare_pages()
+            if (
+                time.monotonic() - self._last_full_refresh
+                >= self.FULL_REFRESH_INTERVAL
+            ):
+                self._full_refresh()
+                return True
+
+            try:
+                with profiler.stage("pagemap"):
+                    dirty = self._get_dirty_pages()
+            except OSError:
+                print("[librgb] Can't track changes of process %d" % self.pid)
+                self._use_soft_dirty = False
+                self._full_refresh()
+                return True
+            self._clear_soft_dirty()
+            for page in dirty:
+                del self._pages[page]
+            if dirty:
+                self._generation += 1
+            return bool(dirty)
+
+    def _full_refresh(self):
+        self._read_maps()
+        if self._use_soft_dirty:
+            self._clear_soft_dirty()
+        self._pages.clear()
+        self._generation += 1
+        self._last_full_refresh = time.monotonic()
+
+    # Reads the pages of the last frame again and keeps those that changed,
+    # or drops all pages if the mappings changed. Other pages aren't worth
+    # comparing; they're dropped, and as they may have changed unseen, that
+    # counts as a change, so the next frame reads what it shows afresh.
+    def _compare_pages(self):
+        if (
+            time.monotonic() - self._last_full_refresh
+            >= self.FULL_REFRESH_INTERVAL
+        ):
+            self._last_full_refresh = time.monotonic()
+            if self._read_maps():
+                self._pages.clear()
+                self._generation += 1
+                return True
+
+        # with no frame rendered since the previous refresh, the shown
+        # pages are still the same
+        if self._read_pages:
+            self._shown_pages, self._read_pages = self._read_pages, set()
+        dropped = [
+            page for page in self._pages if page not in self._shown_pages
+        ]
+        for page in dropped:
+            del self._pages[page]
+
+        changed = []
+        pages = [
+            page for page, data in self._pages.items() if data is not None
+        ]
+        with profiler.stage("compare"):
+            for run in _get_runs(sorted(pages)):
+                view = self._read_run(run)
+                for page in run:
+                    data = view[page - run[0] : page - run[0] + _PAGE_SIZE]
+                    if data != self._pages[page]:
+                        self._pages[page] = data
+                        changed.append(page)
+        if changed or dropped:
+            self._generation += 1
+        return bool(changed or dropped)
+
+    # Reads the readable mappings; returns whether they changed.
+    def _read_maps(self):
+        maps = []
+        with open("/proc/%d/maps" % self.pid, "r") as handle:
+            for line in handle:
+                fields = line.split(None, 5)
+                if not fields[1].startswith("r"):
+                    continue
+                start, end = (int(num, 16) for num in fields[0].split("-"))
+                name = fields[5].strip() if len(fields) > 5 else ""
+                maps.append((start, end, name))
+        maps.sort()
+        if maps == self._maps:
+            return False
+        self._maps = maps
+        self._segments = SegmentIndex(
+            (start, end) for start, end, _name in self._maps
+        )
+        # what couldn't be read may be mapped by now
+        self._unreadable.clear()
+        return True
+
+    def _clear_soft_dirty(self):
+        try:
+            with open("/proc/%d/clear_refs" % self.pid, "w") as handle:
+                handle.write("4")
+        except OSError:
+            print("[librgb] Can't track changes of process %d" % self.pid)
+            self._use_soft_dirty = False
+
+    def _get_dirty_pages(self):
+        if self._pagemap is None:
+            self._pagemap = os.open("/proc/%d/pagemap" % self.pid, os.O_RDONLY)
+        dirty = []
+        for run in _get_runs(sorted(self._pages)):
+            entries = _read_pagemap(
+                self._pagemap, run[0] // _PAGE_SIZE, len(run)
+            )
+            dirty += [
+                page
+                for page, entry in zip(run, entries)
+                if entry & _SOFT_DIRTY_BIT
+            ]
+        return dirty
+
+    # Reads given pages, with one batch of reads per run of consecutive ones.
+    def _fetch_pages(self, pages):
+        for run in _get_runs(pages):
+            start = run[0]
+            with profiler.stage("fetch"):
+                view = self._read_run(run)
+            for page in run:
+                is_mapped = any(self._segments.intersect(page, page + 1))
+                self._pages[page] = (
+                    view[page - start : page - start + _PAGE_SIZE]
+                    if is_mapped
+                    else None
+                )
+
+    # Reads a run of consecutive pages, with NULL bytes where nothing is
+    # mapped.
+    def _read_run(self, run):
+        start = run[0]
+        end = run[-1] + _PAGE_SIZE
+        data = bytearray(end - start)
+        pieces = list(self._segments.intersect(start, end))
+        if pieces:
+            self._read_pieces(data, start, pieces)
+        return memoryview(data)
+
+    def _read_pieces(self, data, start, pieces):
+        if self._use_process_vm_readv:
+            pieces = self._read_with_process_vm_readv(data, start, pieces)
+        for piece_start, piece_end in pieces:
+            try:
+                chunk = os.pread(
+                    self._mem, piece_end - piece_start, piece_start
+                )
+            except (OSError, OverflowError):
+                chunk = b""
+            offset = piece_start - start
+            data[offset : offset + len(chunk)] = chunk
+            if len(chunk) < piece_end - piece_start and (
+                piece_start not in self._unreadable
+            ):
+                self._unreadable.add(piece_start)
+                print(
+                    "[librgb] Some bytes are unreadable in %x..%x"
+                    % (piece_start, piece_end)
+                )
+
+    # Reads as many pieces as possible with a single system call per
+    # _IOV_MAX of them; returns those that have yet to be read.
+    def _read_with_process_vm_readv(self, data, start, pieces):
+        buffer = (ctypes.c_char * len(data)).from_buffer(data)
+        address = ctypes.addressof(buffer)
+        unread = []
+        idx = 0
+        while idx < len(pieces):
+            batch = pieces[idx : idx + _IOV_MAX]
+            local = (_IoVec * len(batch))(
+                *[
+                    _IoVec(
+                        address + piece_start - start, piece_end - piece_start
+                    )
+                    for piece_start, piece_end in batch
+                ]
+            )
+            remote = (_IoVec * len(batch))(
+                *[
+                    _IoVec(piece_start, piece_end - piece_start)
+                    for piece_start, piece_end in batch
+                ]
+            )
+            count = _process_vm_readv(
+                self.pid, local, len(batch), remote, len(batch), 0
+            )
+            if count < 0:
+                if ctypes.get_errno() in (errno.ENOSYS, errno.EPERM):
+                    self._use_process_vm_readv = False
+                    unread += pieces[idx:]
+                    break
+                count = 0
+            # the read stops at the first piece it can't read whole
+            for piece_start, piece_end in batch:
+                idx += 1
+                if count < piece_end - piece_start:
+                    unread.append((piece_start + count, piece_end))
+                    break
+                count -= piece_end - piece_start
+        return unread
+
+    @property
+    def version(self):
+        return self._generation
+
+    @property
+    def min_address(self):
+        return self._maps[0][0] if self._maps else 0
+
+    @property
+    def max_address(self):
+        return self._maps[-1][1] if self._maps else 0
+
+    @property
+    def address_text(self):
+        idx = bisect.bisect_right(self._maps, (self.address, float("inf")))
+        if idx and self._maps[idx - 1][1] > self.address:
+            name = self._maps[idx - 1][2]
+            if name:
+                return "%d:%s @ %08x" % (self.pid, name, self.address)
+        return "%d @ %08x" % (self.pid, self.address)
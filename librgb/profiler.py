@@ -0,0 +1,90 @@
+import contextlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+_state = threading.local()
+_log = None
+_log_lock = threading.Lock()
+
+
+# How long each stage of rendering a single frame took. Stages nested in
+# other stages are named after both, e.g. "read.fetch".
+class FrameTimings(object):
+    def __init__(self, **info):
+        self.info = info
+        self.stages = OrderedDict()
+        self.timestamp = time.time()
+
+    def add(self, name, elapsed):
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    @property
+    def total(self):
+        return sum(
+            elapsed for name, elapsed in self.stages.items() if "." not in name
+        )
+
+    def to_dict(self):
+        result = dict(self.info)
+        result["timestamp"] = self.timestamp
+        result["total_ms"] = self.total * 1000
+        result["stages_ms"] = OrderedDict(
+            (name, elapsed * 1000) for name, elapsed in self.stages.items()
+        )
+        return result
+
+    def __str__(self):
+        return ", ".join(
+            ["%.1f ms" % (self.total * 1000)]
+            + [
+                "%s %.1f" % (name, elapsed * 1000)
+                for name, elapsed in self.stages.items()
+            ]
+        )
+
+
+# Makes stages entered by the current thread count towards given timings.
+@contextlib.contextmanager
+def collect(timings):
+    previous = getattr(_state, "timings", None), getattr(_state, "path", [])
+    _state.timings, _state.path = timings, []
+    try:
+        yield timings
+    finally:
+        _state.timings, _state.path = previous
+
+
+# Times the enclosed code; does nothing unless called within collect().
+@contextlib.contextmanager
+def stage(name):
+    timings = getattr(_state, "timings", None)
+    if timings is None:
+        yield
+        return
+    _state.path.append(name)
+    full_name = ".".join(_state.path)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(full_name, time.perf_counter() - start)
+        _state.path.pop()
+
+
+# Appends the timings of every finished frame to given file, one JSON object
+# per line. Pass None to stop logging.
+def open_log(path):
+    global _log  # pylint: disable=global-statement
+    with _log_lock:
+        if _log is not None:
+            _log.close()
+        _log = None if path is None else open(path, "a")
+
+
+def finish(timings):
+    with _log_lock:
+        if _log is not None:
+            _log.write(json.dumps(timings.to_dict()) + "\n")
+            _log.flush()
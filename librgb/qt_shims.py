@@ -4,13 +4,16 @@ try:
     from PyQt5 import QtCore
     from PyQt5 import QtGui
     from PyQt5 import QtWidgets
+    from PyQt5.QtCore import pyqtSignal as Signal
 
 except ImportError:
     try:
         from PySide import QtCore
         from PySide import QtGui
+        from PySide.QtCore import Signal
     except ImportError:
         from PyQt4 import QtCore
         from PyQt4 import QtGui
+        from PyQt4.QtCore import pyqtSignal as Signal
 
     QtWidgets = QtGui
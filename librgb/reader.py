@@ -1,3 +1,31 @@
+try:
+    import numpy
+
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+# Copies `count` pieces of `size` bytes, each `stride` bytes after the
+# previous one, out of `data`; pieces past its end are padded with NULL
+# bytes.
+def gather_strided(data, size, stride, count):
+    if HAS_NUMPY and count and len(data) >= (count - 1) * stride + size:
+        arr = numpy.frombuffer(data, dtype=numpy.uint8)
+        return (
+            numpy.lib.stride_tricks.as_strided(arr, (count, size), (stride, 1))
+            .copy()
+            .ravel()
+        )
+
+    result = bytearray(size * count)
+    view = memoryview(data)
+    for idx in range(count):
+        chunk = view[idx * stride : idx * stride + size]
+        result[idx * size : idx * size + len(chunk)] = chunk
+    return result
+
+
 class Reader(object):
     def __init__(self):
         self._address = self.min_address
@@ -10,9 +38,41 @@ class Reader(object):
     def max_address(self):
         raise NotImplementedError()
 
+    # Changes whenever previously read data may have become stale.
+    @property
+    def version(self):
+        return 0
+
     def get_padded_bytes(self, size):
+        return self.get_padded_bytes_at(self.address, size)
+
+    def get_padded_bytes_at(self, address, size):
         raise NotImplementedError()
 
+    # Reads `count` pieces of `size` bytes, each `stride` bytes after the
+    # previous one, into a single buffer; e.g. a few columns of many rows.
+    def get_padded_strided_bytes_at(self, address, size, stride, count):
+        return b"".join(
+            self.get_padded_bytes_at(address + idx * stride, size)
+            for idx in range(count)
+        )
+
+    # Identifies the data across sessions (e.g. to keep bookmarks of it), or
+    # None if it can't be told apart from other data.
+    @property
+    def content_key(self):
+        return None
+
+    # Drops whatever is cached of data that changes on its own, like memory
+    # of a running process; returns whether anything may have changed.
+    def refresh(self):
+        return False
+
+    # Hints that the `size` bytes right before and after given address are
+    # likely to be read next.
+    def prefetch(self, address, size):
+        pass
+
     @property
     def address(self):
         return self._address
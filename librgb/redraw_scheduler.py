@@ -0,0 +1,36 @@
+from librgb.qt_shims import QtCore
+
+
+# Coalesces bursts of redraw requests (held keys, scrubbed spinboxes) into
+# at most one redraw per frame interval; the intermediate requests are
+# dropped since only the latest parameters matter.
+class RedrawScheduler(object):
+    def __init__(self, callback, interval=1000 // 60):
+        self.callback = callback
+        self.requested_frames = 0
+        self.rendered_frames = 0
+        self._timer = QtCore.QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self._fire)
+
+    @property
+    def pending(self):
+        return self._timer.isActive()
+
+    @property
+    def dropped_frames(self):
+        return (
+            self.requested_frames
+            - self.rendered_frames
+            - (1 if self.pending else 0)
+        )
+
+    def schedule(self):
+        self.requested_frames += 1
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def _fire(self):
+        self.rendered_frames += 1
+        self.callback()
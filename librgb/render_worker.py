@@ -0,0 +1,120 @@
+import threading
+import traceback
+from collections import OrderedDict
+
+from librgb.qt_shims import QtCore, Signal
+
+
+class _RenderJobSignals(QtCore.QObject):
+    finished = Signal(object)
+
+
+# Calls get_image() of anything renderer-like on a Qt thread pool and emits
+# the image unless cancelled.
+class RenderJob(QtCore.QRunnable):
+    def __init__(self, renderer):
+        super(RenderJob, self).__init__()
+        self.renderer = renderer
+        self.signals = _RenderJobSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def run(self):
+        # cancelled while waiting for a thread
+        if self.is_cancelled():
+            return
+        try:
+            image = self.renderer.get_image(self.is_cancelled)
+        except Exception:  # pylint: disable=broad-except
+            # exceptions must not propagate into Qt's thread pool
+            traceback.print_exc()
+            return
+        if image is not None and not self.is_cancelled():
+            self.signals.finished.emit(image)
+
+
+# Renders QImages on a background thread and hands them along with their
+# renderers to the callback on the GUI thread. Only the most recently
+# submitted render is delivered; any older one still in flight is cancelled.
+class RenderWorker(object):
+    def __init__(self, callback):
+        self.callback = callback
+        self._pool = QtCore.QThreadPool()
+        self._pool.setMaxThreadCount(1)
+        self._job = None
+
+    @property
+    def busy(self):
+        return self._job is not None
+
+    def submit(self, renderer):
+        self.cancel()
+        job = RenderJob(renderer)
+        job.signals.finished.connect(
+            lambda image: self._job_finished(job, image)
+        )
+        self._job = job
+        self._pool.start(job)
+
+    def cancel(self):
+        if self._job is not None:
+            self._job.cancel()
+            self._job = None
+
+    def _job_finished(self, job, image):
+        if job is self._job:
+            self._job = None
+            self.callback(job.renderer, image)
+
+
+# Renders images that are likely to be shown next (e.g. those of the
+# neighbouring files) on a pool of background threads and keeps the last few
+# of them, so that switching to them needs no rendering at all.
+class Prerenderer(object):
+    MAX_IMAGES = 8
+
+    def __init__(self):
+        self._pool = QtCore.QThreadPool()
+        self._pool.setMaxThreadCount(max(1, QtCore.QThread.idealThreadCount()))
+        self._jobs = {}
+        self._images = OrderedDict()
+
+    # Cancels what's no longer wanted and starts rendering what isn't there
+    # yet; both are keyed by the renderer key.
+    def submit(self, renderers):
+        renderers = {renderer.key: renderer for renderer in renderers}
+        for key in list(self._jobs):
+            if key not in renderers:
+                self._jobs.pop(key).cancel()
+        for key, renderer in renderers.items():
+            if key in self._jobs or key in self._images:
+                continue
+            job = RenderJob(renderer)
+            job.signals.finished.connect(
+                lambda image, job=job: self._job_finished(job, image)
+            )
+            self._jobs[key] = job
+            self._pool.start(job)
+
+    # Cancels all renders in flight; those already rendered are kept.
+    def cancel(self):
+        for job in self._jobs.values():
+            job.cancel()
+        self._jobs.clear()
+
+    # Returns the renderer and image rendered for given key, if any.
+    def take(self, key):
+        return self._images.pop(key, None)
+
+    def _job_finished(self, job, image):
+        key = job.renderer.key
+        if self._jobs.get(key) is job:
+            del self._jobs[key]
+            self._images[key] = (job.renderer, image)
+            while len(self._images) > self.MAX_IMAGES:
+                self._images.popitem(last=False)
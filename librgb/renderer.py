@@ -1,3 +1,14 @@
+import collections
+import functools
+import threading
+
+from librgb import (
+    bit_unpacker,
+    frame_diff,
+    profiler,
+    texture_decoder,
+    yuv_decoder,
+)
 from librgb.pixel_formats import PixelFormats
 from librgb.qt_shims import QtGui
 
@@ -6,11 +17,17 @@ try:
 
     HAS_NUMPY = True
 except ImportError:
-    print("[librgb] Brightness adjustment will be slow without numpy")
     HAS_NUMPY = False
 
 
-_FORMAT_MAP = {
+# bits per pixel, the Qt format the data gets loaded as and whether Qt then
+# needs to swap the red and blue channels and invert the alpha channel.
+# Packed formats are described by bit_unpacker instead.
+_QtFormat = collections.namedtuple(
+    "_QtFormat", "bits qt_format swap_rgb invert_alpha"
+)
+
+_QT_FORMATS = {
     PixelFormats.GRAY1MSB: (1, QtGui.QImage.Format_Mono, False, False),
     PixelFormats.GRAY1LSB: (1, QtGui.QImage.Format_MonoLSB, False, False),
     PixelFormats.GRAY8: (8, QtGui.QImage.Format_Indexed8, False, False),
@@ -26,77 +43,741 @@ _FORMAT_MAP = {
     PixelFormats.BGRA8888: (32, QtGui.QImage.Format_ARGB32, False, False),
     PixelFormats.BGRA8888i: (32, QtGui.QImage.Format_ARGB32, False, True),
     PixelFormats.BGRA8888x: (32, QtGui.QImage.Format_RGB32, False, False),
+    PixelFormats.INDEXED2MSB: (2, QtGui.QImage.Format_Indexed8, False, False),
+    PixelFormats.INDEXED2LSB: (2, QtGui.QImage.Format_Indexed8, False, False),
+    PixelFormats.INDEXED4MSB: (4, QtGui.QImage.Format_Indexed8, False, False),
+    PixelFormats.INDEXED4LSB: (4, QtGui.QImage.Format_Indexed8, False, False),
+    PixelFormats.INDEXED8: (8, QtGui.QImage.Format_Indexed8, False, False),
+    # decoded to BGRA by texture_decoder first
+    PixelFormats.DXT1: (4, QtGui.QImage.Format_ARGB32, False, False),
+    PixelFormats.DXT5: (8, QtGui.QImage.Format_ARGB32, False, False),
+    PixelFormats.ETC1: (4, QtGui.QImage.Format_ARGB32, False, False),
+    # converted to BGRX by yuv_decoder first
+    PixelFormats.NV12: (12, QtGui.QImage.Format_RGB32, False, False),
+    PixelFormats.I420: (12, QtGui.QImage.Format_RGB32, False, False),
+    PixelFormats.YUYV: (16, QtGui.QImage.Format_RGB32, False, False),
+    PixelFormats.UYVY: (16, QtGui.QImage.Format_RGB32, False, False),
 }
 
+_FORMAT_MAP = {
+    pixel_format: _QtFormat(*item)
+    for pixel_format, item in _QT_FORMATS.items()
+}
 
-class Renderer(object):
-    def __init__(self, params):
-        self.params = params
+# Whether the first pixel of indexed formats is in the high bits of a byte.
+# Their rows are padded to whole bytes and unpacked to 8 bits per pixel.
+_INDEXED_FORMATS = {
+    PixelFormats.INDEXED2MSB: True,
+    PixelFormats.INDEXED2LSB: False,
+    PixelFormats.INDEXED4MSB: True,
+    PixelFormats.INDEXED4LSB: False,
+    PixelFormats.INDEXED8: True,
+}
 
-    @staticmethod
-    def get_bit_count(pixel_format):
-        return _FORMAT_MAP[pixel_format][0]
+_MAX_CACHED_COLOR_TABLES = 64
+_color_tables = collections.OrderedDict()
+_color_tables_lock = threading.Lock()
 
-    def get_pixmap(self):
-        params = self.params
-        reader = self.params.reader
-        if reader is None:
-            return QtGui.QPixmap()
+_MAX_CACHED_BLOCK_ROWS = 1024
+_block_rows = collections.OrderedDict()
+_block_rows_lock = threading.Lock()
 
-        if params.format not in _FORMAT_MAP:
-            raise NotImplementedError()
+_SWAP_555 = 1
+_SWAP_565 = 2
+_INVERT_ALPHA = 3
+_OPAQUE = 4
 
-        bits, qt_format, swap_rgb, invert_alpha = _FORMAT_MAP[params.format]
+# Formats that can be displayed without the extra passes above: either Qt
+# can read the data as is (newer Qt versions only), or the channels get
+# fixed up while the data is transformed anyway (numpy only). RGB888 isn't
+# here since Qt converts Format_BGR888 to a pixmap slower than it swaps.
+_NATIVE_FORMATS = {
+    PixelFormats.GRAY8: ("Format_Grayscale8", None),
+    PixelFormats.RGB555: ("Format_RGB555", _SWAP_555),
+    PixelFormats.RGB565: ("Format_RGB16", _SWAP_565),
+    PixelFormats.RGBA8888: ("Format_RGBA8888", None),
+    PixelFormats.RGBA8888i: ("Format_RGBA8888", _INVERT_ALPHA),
+    PixelFormats.RGBA8888x: ("Format_RGBX8888", _OPAQUE),
+    PixelFormats.BGRA8888i: ("Format_ARGB32", _INVERT_ALPHA),
+    PixelFormats.BGRA8888x: ("Format_RGB32", _OPAQUE),
+}
 
-        stride = (params.width * bits) // 8
-        data_size = params.shown_bytes
+if HAS_NUMPY:
+    # the 4th byte of each 32-bit pixel, whatever the byte order
+    _ALPHA_MASK = numpy.frombuffer(b"\0\0\0\xff", dtype=numpy.uint32)[0]
 
-        data = reader.get_padded_bytes(data_size)
-        assert data is not None
-        assert len(data) == data_size
-
-        if params.flip:
-            output = b""
-            for y in range(params.height):
-                y2 = params.height - 1 - y
-                output += data[y2 * stride : (y2 + 1) * stride]
-            data = output
-
-        if params.brightness != 50.0:
-            # param   multiplier
-            # 0       0 = 2^(-8)
-            # 50      1 = 2^0
-            # 100     256 = 2^8
-            multiplier = 2 ** ((params.brightness - 50) / (50 / 8))
-            if HAS_NUMPY:
-                arr = numpy.fromstring(data, dtype=numpy.uint8)
-                arr = arr.astype(dtype=numpy.float)
-                arr *= multiplier
-                arr = arr.clip(0, 255)
-                arr = arr.astype(dtype=numpy.uint8)
-                data = arr.tobytes()
-            else:
-                output = bytearray(data)
-                for i in range(len(data)):
-                    output[i] = max(min(int(output[i] * multiplier), 0xFF), 0)
-                data = output
+# pixel format -> (Qt format, pixel op) for those available here
+_NATIVE_MAP = {
+    pixel_format: (getattr(QtGui.QImage, qt_format_name), pixel_op)
+    for pixel_format, (qt_format_name, pixel_op) in _NATIVE_FORMATS.items()
+    if hasattr(QtGui.QImage, qt_format_name)
+    and (pixel_op is None or HAS_NUMPY)
+}
 
-        image = QtGui.QImage(
-            data, params.width, params.height, stride, qt_format
+
+# Unpacked gray pixels are shown as is where Qt supports that; Indexed8
+# without a color table shows the same grays, only slower.
+_GRAYSCALE_FORMAT = getattr(
+    QtGui.QImage, "Format_Grayscale8", QtGui.QImage.Format_Indexed8
+)
+
+
+def _get_native_format(pixel_format, brightness):
+    native_format = _NATIVE_MAP.get(pixel_format)
+    if native_format and brightness == 50.0:
+        if native_format[1] in (_SWAP_555, _SWAP_565):
+            # a lookup table only beats Qt's swap if it's needed anyway
+            return None
+    return native_format
+
+
+def _get_brightness_multiplier(brightness):
+    # param   multiplier
+    # 0       0 = 2^(-8)
+    # 50      1 = 2^0
+    # 100     256 = 2^8
+    return 2 ** ((brightness - 50) / (50 / 8))
+
+
+@functools.lru_cache(maxsize=16)
+def _get_brightness_table(brightness):
+    multiplier = _get_brightness_multiplier(brightness)
+    return bytes(max(min(int(i * multiplier), 0xFF), 0) for i in range(256))
+
+
+# Maps every 16-bit pixel to the one with red and blue swapped, with the
+# brightness of both bytes adjusted on the way.
+@functools.lru_cache(maxsize=4)
+def _get_swap_table(pixel_op, brightness):
+    table = numpy.frombuffer(_get_brightness_table(brightness), numpy.uint8)
+    pixels = numpy.arange(0x10000, dtype=numpy.uint16)
+    pixels = table[pixels & 0xFF].astype(numpy.uint16) | (
+        table[pixels >> 8].astype(numpy.uint16) << 8
+    )
+    red_shift = 10 if pixel_op == _SWAP_555 else 11
+    fields = 0x1F | (0x1F << red_shift)
+    return (
+        (pixels & ~numpy.uint16(fields))
+        | ((pixels & 0x1F) << red_shift)
+        | ((pixels >> red_shift) & 0x1F)
+    )
+
+
+# Flips and adjusts the brightness of the raw pixel data in a single pass,
+# copying the frame at most once (with numpy) and not at all if there's
+# nothing to do. `pixel_op` fixes up the channels in the same pass (numpy
+# only).
+def _transform(data, stride, height, flip, brightness, pixel_op=None):
+    table = _get_brightness_table(brightness) if brightness != 50.0 else None
+    if not flip and table is None and pixel_op is None:
+        return data
+
+    if HAS_NUMPY:
+        # 16-bit swaps work on whole pixels, everything else on bytes
+        unit = 2 if pixel_op in (_SWAP_555, _SWAP_565) else 1
+        source = arr = numpy.frombuffer(
+            data, dtype=numpy.uint16 if unit == 2 else numpy.uint8
+        )
+        if flip:
+            arr = arr[: stride * height // unit].reshape(height, -1)[::-1]
+        if unit == 2:
+            arr = numpy.take(_get_swap_table(pixel_op, brightness), arr)
+        elif table is not None:
+            arr = numpy.take(numpy.frombuffer(table, dtype=numpy.uint8), arr)
+        arr = numpy.ascontiguousarray(arr).ravel().view(numpy.uint8)
+        if pixel_op in (_INVERT_ALPHA, _OPAQUE):
+            # whole pixels at a time; in place unless it's still the input
+            combine = (
+                numpy.bitwise_xor
+                if pixel_op == _INVERT_ALPHA
+                else numpy.bitwise_or
+            )
+            words = arr.view(numpy.uint32)
+            out = None if numpy.may_share_memory(arr, source) else words
+            arr = combine(words, _ALPHA_MASK, out=out).view(numpy.uint8)
+        return arr
+
+    if flip:
+        view = memoryview(data)
+        data = b"".join(
+            view[y * stride : (y + 1) * stride]
+            for y in range(height - 1, -1, -1)
         )
-        if image.byteCount():
-            assert len(data) == image.byteCount()
+    if table is not None:
+        data = bytes(data).translate(table)
+    return data
 
-        if swap_rgb:
+
+@functools.lru_cache(maxsize=4)
+def _get_unpack_table(bits, msb_first):
+    shifts = range(0, 8, bits)
+    if msb_first:
+        shifts = reversed(shifts)
+    shifts = list(shifts)
+    mask = (1 << bits) - 1
+    return [
+        bytes((value >> shift) & mask for shift in shifts)
+        for value in range(256)
+    ]
+
+
+# Spreads the indices of 2 and 4-bit indexed formats over whole bytes, so
+# that Qt can show them as Format_Indexed8.
+def _unpack_indices(data, width, height, stride, bits, msb_first):
+    if bits == 8 and stride == width:
+        return data
+
+    if HAS_NUMPY:
+        shifts = numpy.arange(0, 8, bits, dtype=numpy.uint8)
+        if msb_first:
+            shifts = shifts[::-1]
+        arr = numpy.frombuffer(data, dtype=numpy.uint8)
+        arr = arr[: stride * height].reshape(height, stride, 1)
+        arr = ((arr >> shifts) & ((1 << bits) - 1)).reshape(height, -1)
+        return numpy.ascontiguousarray(arr[:, :width]).ravel()
+
+    table = _get_unpack_table(bits, msb_first)
+    view = memoryview(data)
+    return b"".join(
+        b"".join(map(table.__getitem__, view[y * stride : (y + 1) * stride]))[
+            :width
+        ]
+        for y in range(height)
+    )
+
+
+# Qt turns RGB32 images into pixmaps without copying their pixels, so the
+# pixmap would outlive the buffer the image was made from.
+def _make_qimage(data, width, height, stride, qt_format):
+    image = QtGui.QImage(data, width, height, stride, qt_format)
+    if qt_format == QtGui.QImage.Format_RGB32:
+        image = image.copy()
+    return image
+
+
+def _to_qimage(data, width, height, stride, pixel_format, native_format):
+    if native_format:
+        return _make_qimage(data, width, height, stride, native_format[0])
+
+    _bits, qt_format, swap_rgb, invert_alpha = _FORMAT_MAP[pixel_format]
+
+    image = QtGui.QImage(data, width, height, stride, qt_format)
+    if image.byteCount():
+        assert len(data) == image.byteCount()
+
+    if swap_rgb:
+        with profiler.stage("swap"):
             image = image.rgbSwapped()
-        if invert_alpha:
+    if invert_alpha:
+        with profiler.stage("invert"):
             image.invertPixels(QtGui.QImage.InvertRgba)
             image.invertPixels(QtGui.QImage.InvertRgb)
 
-        # Creating pixmap crashes for RGB32?
-        if qt_format == QtGui.QImage.Format_RGB32:
+    # Creating pixmap crashes for RGB32?
+    if qt_format == QtGui.QImage.Format_RGB32:
+        with profiler.stage("convert"):
             image = image.convertToFormat(QtGui.QImage.Format_RGB888)
 
+    return image
+
+
+# Unpacks the pixels of packed formats and wraps them in a QImage.
+def _unpack_to_qimage(data, width, height, stride, pixel_format, brightness):
+    pixels = bit_unpacker.unpack(
+        data,
+        pixel_format,
+        width,
+        height,
+        stride,
+        _get_brightness_table(brightness) if brightness != 50.0 else None,
+    )
+    if pixels.ndim == 2:
+        qt_format = _GRAYSCALE_FORMAT
+    elif bit_unpacker.has_alpha(pixel_format):
+        qt_format = QtGui.QImage.Format_ARGB32
+    else:
+        qt_format = QtGui.QImage.Format_RGB32
+    return _make_qimage(
+        pixels.ravel(), width, height, pixels.strides[0], qt_format
+    )
+
+
+# Decodes a palette of `count` entries into a Qt color table by rendering it
+# as a 1 pixel high image, so entries can be in any non-indexed format.
+def _read_color_table(reader, address, pixel_format, count, brightness):
+    if reader is None or address is None:
+        table = _get_brightness_table(brightness)
+        return [
+            0xFF000000 | table[i * 0xFF // (count - 1)] * 0x010101
+            for i in range(count)
+        ]
+
+    if not Renderer.is_palette_format(pixel_format):
+        raise RuntimeError(
+            "Palette entries can't be in the %s format"
+            % PixelFormats.get_long_names()[pixel_format]
+        )
+    stride = Renderer.get_stride(pixel_format, count)
+    if bit_unpacker.is_packed_format(pixel_format):
+        image = _unpack_to_qimage(
+            reader.get_padded_bytes_at(address, stride),
+            count,
+            1,
+            stride,
+            pixel_format,
+            brightness,
+        )
+        return [image.pixel(x, 0) for x in range(count)]
+
+    native_format = _get_native_format(pixel_format, brightness)
+    data = _transform(
+        reader.get_padded_bytes_at(address, stride),
+        stride,
+        1,
+        False,
+        brightness,
+        pixel_op=native_format[1] if native_format else None,
+    )
+    image = _to_qimage(data, count, 1, stride, pixel_format, native_format)
+    return [image.pixel(x, 0) for x in range(count)]
+
+
+def _get_color_table(key):
+    with _color_tables_lock:
+        if key in _color_tables:
+            _color_tables.move_to_end(key)
+            return _color_tables[key]
+
+    reader, _version, address, pixel_format, count, brightness = key
+    color_table = _read_color_table(
+        reader, address, pixel_format, count, brightness
+    )
+    with _color_tables_lock:
+        _color_tables[key] = color_table
+        if len(_color_tables) > _MAX_CACHED_COLOR_TABLES:
+            _color_tables.popitem(last=False)
+    return color_table
+
+
+# Returns `count` consecutive rows of 4x4 blocks of a compressed texture as
+# pixels, decoding only the rows that aren't cached yet.
+def _get_block_rows(reader, version, address, pixel_format, blocks_x, count):
+    row_size = blocks_x * texture_decoder.get_block_size(pixel_format)
+    keys = [
+        (reader, version, address + i * row_size, pixel_format, blocks_x)
+        for i in range(count)
+    ]
+    rows = [None] * count
+    with _block_rows_lock:
+        for i, key in enumerate(keys):
+            if key in _block_rows:
+                _block_rows.move_to_end(key)
+                rows[i] = _block_rows[key]
+
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if missing:
+        start, end = missing[0], missing[-1] + 1
+        with profiler.stage("read"):
+            data = reader.get_padded_bytes_at(
+                address + start * row_size, (end - start) * row_size
+            )
+        with profiler.stage("decode"):
+            pixels = texture_decoder.decode_blocks(
+                data, pixel_format, blocks_x, end - start
+            )
+        with _block_rows_lock:
+            for i in range(start, end):
+                rows[i] = pixels[(i - start) * 4 : (i - start + 1) * 4]
+                _block_rows[keys[i]] = rows[i]
+            while len(_block_rows) > _MAX_CACHED_BLOCK_ROWS:
+                _block_rows.popitem(last=False)
+
+    return numpy.concatenate(rows)
+
+
+# The transformed pixel data of a rendered image, kept around so that the
+# next render can reuse the rows that are still visible after scrolling.
+_Frame = collections.namedtuple("_Frame", "key address data")
+
+
+# Captures the parameters at construction time so that the rendering itself
+# can run on a worker thread while the user keeps changing them. `reader`
+# and `address` render the same view of other data than the current one.
+class Renderer(object):
+    def __init__(self, params, previous_frame=None, reader=None, address=None):
+        self.reader = params.reader if reader is None else reader
+        self.address = address
+        if self.address is None and self.reader is not None:
+            self.address = self.reader.address
+        self.version = None if self.reader is None else self.reader.version
+        self.format = params.format
+        self.width = params.width
+        self.height = params.height
+        self.flip = params.flip
+        self.brightness = params.brightness
+        self.row_alignment = params.row_alignment
+        self.previous_frame = previous_frame
+        self.frame = None
+        self.diff_reader = params.diff_reader
+        self._diff_key = None
+        if self.diff_reader is not None:
+            self._diff_key = (self.diff_reader, self.diff_reader.version)
+        self._diff_summary = None
+        self._native_format = _get_native_format(self.format, self.brightness)
+        self._palette_key = None
+        if self.format in _INDEXED_FORMATS:
+            palette_reader = params.palette_reader or self.reader
+            self._palette_key = (
+                palette_reader,
+                None if palette_reader is None else palette_reader.version,
+                params.palette_address,
+                params.palette_format,
+                1 << self.get_bit_count(self.format),
+                self.brightness,
+            )
+        # indexed formats adjust the palette instead, packed formats the
+        # unpacked channels
+        self._data_brightness = self.brightness
+        if self._palette_key or bit_unpacker.is_packed_format(self.format):
+            self._data_brightness = 50.0
+        self.timings = profiler.FrameTimings(
+            address=self.address,
+            format=PixelFormats.get_short_names().get(self.format),
+            width=self.width,
+            height=self.height,
+            flip=self.flip,
+            brightness=self.brightness,
+        )
+
+    @staticmethod
+    def get_bit_count(pixel_format):
+        if bit_unpacker.is_packed_format(pixel_format):
+            return bit_unpacker.get_bit_count(pixel_format)
+        return _FORMAT_MAP[pixel_format].bits
+
+    # Rows take up whole bytes, padded to a multiple of `row_alignment`.
+    @staticmethod
+    def get_stride(pixel_format, width, row_alignment=1):
+        stride = (width * Renderer.get_bit_count(pixel_format) + 7) // 8
+        return stride + -stride % row_alignment
+
+    @staticmethod
+    def is_decoded_format(pixel_format):
+        return texture_decoder.is_block_format(
+            pixel_format
+        ) or yuv_decoder.is_yuv_format(pixel_format)
+
+    # Whether palette entries can be in given format, i.e. whether it holds
+    # colors one pixel at a time.
+    @staticmethod
+    def is_palette_format(pixel_format):
+        bits = Renderer.get_bit_count(pixel_format)
+        return bits >= 16 and not Renderer.is_decoded_format(pixel_format)
+
+    @property
+    def key(self):
+        return (
+            self.reader,
+            self.version,
+            self.address,
+            self.format,
+            self.width,
+            self.height,
+            self.flip,
+            self.brightness,
+            self.row_alignment,
+            self._palette_key,
+            self._diff_key,
+        )
+
+    @property
+    def _frame_key(self):
+        return (
+            self.reader,
+            self.version,
+            self.format,
+            self.width,
+            self.height,
+            self.flip,
+            self.brightness,
+            self.row_alignment,
+        )
+
+    def get_image(self, is_cancelled=None):
+        if self.reader is None:
+            return QtGui.QImage()
+
+        with profiler.collect(self.timings):
+            if self.diff_reader is not None:
+                heat, changed = self._get_heatmap(
+                    0, self.height, 0, self.width
+                )
+                self._diff_summary = frame_diff.describe_changes(heat, changed)
+                return self._heat_to_qimage(heat)
+
+            if self._is_decoded:
+                data, stride = self._get_decoded(0, self.height, 0, self.width)
+                if is_cancelled and is_cancelled():
+                    return None
+                return _make_qimage(
+                    data,
+                    self.width,
+                    self.height,
+                    stride,
+                    _FORMAT_MAP[self.format].qt_format,
+                )
+
+            stride = self._get_stride()
+            data = self._get_scrolled_data(stride)
+            if data is None:
+                data = self._get_rows(0, self.height, stride)
+            if is_cancelled and is_cancelled():
+                return None
+
+            self.frame = _Frame(self._frame_key, self.address, data)
+            return self._get_qimage(data, self.width, self.height, stride)
+
+    # Renders a part of the image; for formats with less than 8 bits per
+    # pixel, x needs to be a multiple of 8. The last byte of each row of a
+    # narrower tile at the right edge is taken whole.
+    def get_tile(self, x, y, width, height, is_cancelled=None):
+        if self.reader is None:
+            return QtGui.QImage()
+
+        if self.diff_reader is not None:
+            return self._heat_to_qimage(
+                self._get_heatmap(y, height, x, width)[0]
+            )
+
+        if self._is_decoded:
+            data, stride = self._get_decoded(y, height, x, width)
+            if is_cancelled and is_cancelled():
+                return None
+            return _make_qimage(
+                data, width, height, stride, _FORMAT_MAP[self.format].qt_format
+            )
+
+        bits = self.get_bit_count(self.format)
+        stride = self._get_stride()
+        columns = ((x * bits) // 8, ((x + width) * bits + 7) // 8)
+        data = self._get_rows(y, height, stride, columns)
+        if is_cancelled and is_cancelled():
+            return None
+
+        return self._get_qimage(data, width, height, columns[1] - columns[0])
+
+    # Describes which rows differ from the diff reader and where.
+    def get_diff_summary(self):
+        if self.diff_reader is None:
+            return None
+        if self._diff_summary is None:
+            with profiler.collect(self.timings):
+                self._diff_summary = frame_diff.describe_changes(
+                    *self._get_heatmap(0, self.height, 0, self.width)
+                )
+        return self._diff_summary
+
+    # Compares given part of the image with the same bytes of the diff reader,
+    # returning the difference of each pixel and whether each row changed.
+    def _get_heatmap(self, y, height, x, width):
+        stride = self._get_stride()
+        first_row = self.height - y - height if self.flip else y
+        address = self.address + first_row * stride
+        with profiler.stage("read"):
+            data = self.reader.get_padded_bytes_at(address, height * stride)
+            reference = self.diff_reader.get_padded_bytes_at(
+                address, height * stride
+            )
+
+        with profiler.stage("diff"):
+            changed = frame_diff.get_changed_rows(
+                data,
+                reference,
+                self._diff_key + (address, stride, height),
+                stride,
+                height,
+            )
+            heat = frame_diff.get_heatmap(
+                data,
+                reference,
+                changed,
+                stride,
+                self.get_bit_count(self.format),
+                x,
+                width,
+            )
+        if self.flip:
+            heat, changed = heat[::-1], changed[::-1]
+        return heat, changed
+
+    def _heat_to_qimage(self, heat):
+        if self.brightness != 50.0:
+            table = _get_brightness_table(self.brightness)
+            heat = numpy.take(numpy.frombuffer(table, dtype=numpy.uint8), heat)
+        heat = numpy.ascontiguousarray(heat)
+        height, width = heat.shape
+        image = QtGui.QImage(
+            heat.ravel(), width, height, width, QtGui.QImage.Format_Indexed8
+        )
+        image.setColorTable(frame_diff.HEAT_COLORS)
+        return image
+
+    def _get_stride(self):
+        return self.get_stride(self.format, self.width, self.row_alignment)
+
+    # Reads and transforms given rows, counted from the top of the image.
+    # With `columns`, only that byte range of each row gets read.
+    def _get_rows(self, y, height, stride, columns=None):
+        first_row = self.height - y - height if self.flip else y
+        address = self.address + first_row * stride
+
+        with profiler.stage("read"):
+            if columns is None or columns == (0, stride):
+                data = self.reader.get_padded_bytes_at(
+                    address, height * stride
+                )
+            else:
+                start, end = columns
+                data = self.reader.get_padded_strided_bytes_at(
+                    address + start, end - start, stride, height
+                )
+                stride = end - start
+        assert data is not None
+        assert len(data) == height * stride
+
+        with profiler.stage("transform"):
+            return _transform(
+                data,
+                stride,
+                height,
+                self.flip,
+                self._data_brightness,
+                self._native_format[1] if self._native_format else None,
+            )
+
+    @property
+    def _is_decoded(self):
+        return self.is_decoded_format(self.format)
+
+    # Decodes given part of a compressed or YUV image to 32-bit pixels and
+    # returns them along with their stride.
+    def _get_decoded(self, y, height, x, width):
+        if texture_decoder.is_block_format(self.format):
+            pixels = self._get_block_pixels(y, height)
+        else:
+            pixels = self._get_yuv_pixels(y, height)
+        # rows wider than needed are fine as long as they start at x = 0
+        if x or not pixels.flags.c_contiguous:
+            pixels = numpy.ascontiguousarray(pixels[:, x : x + width])
+        return pixels.ravel(), pixels.strides[0]
+
+    def _get_yuv_pixels(self, y, height):
+        first_row = self.height - y - height if self.flip else y
+
+        def read(offset, size):
+            with profiler.stage("read"):
+                return self.reader.get_padded_bytes_at(
+                    self.address + offset, size
+                )
+
+        with profiler.stage("yuv"):
+            start, pixels = yuv_decoder.decode_yuv(
+                read,
+                self.format,
+                self.width,
+                self.height,
+                first_row,
+                height,
+                self.flip,
+                _get_brightness_multiplier(self.brightness),
+            )
+        if self.flip:
+            top = start + len(pixels) - first_row - height
+        else:
+            top = first_row - start
+        return pixels[top : top + height]
+
+    def _get_block_pixels(self, y, height):
+        first_row = self.height - y - height if self.flip else y
+        first_block_row = first_row // 4
+        blocks_x = (self.width + 3) // 4
+        row_size = blocks_x * texture_decoder.get_block_size(self.format)
+        pixels = _get_block_rows(
+            self.reader,
+            self.version,
+            self.address + first_block_row * row_size,
+            self.format,
+            blocks_x,
+            (first_row + height + 3) // 4 - first_block_row,
+        )
+
+        with profiler.stage("transform"):
+            top = first_row - first_block_row * 4
+            pixels = pixels[top : top + height]
+            if self.flip:
+                pixels = pixels[::-1]
+            if self.brightness != 50.0:
+                table = _get_brightness_table(self.brightness)
+                pixels = numpy.take(
+                    numpy.frombuffer(table, dtype=numpy.uint8), pixels
+                )
+            return pixels
+
+    # If the address moved by whole rows since the previous frame, only the
+    # newly exposed rows get read, the rest is taken from the previous frame.
+    def _get_scrolled_data(self, stride):
+        previous = self.previous_frame
+        if previous is None or previous.key != self._frame_key or not stride:
+            return None
+
+        shift, remainder = divmod(self.address - previous.address, stride)
+        if remainder or abs(shift) >= self.height:
+            return None
+        if not shift:
+            return previous.data
+
+        kept_rows = self.height - abs(shift)
+        old_data = memoryview(previous.data)
+        if (shift > 0) != self.flip:
+            # the old rows move up
+            new_data = self._get_rows(kept_rows, abs(shift), stride)
+            with profiler.stage("scroll"):
+                return b"".join([old_data[abs(shift) * stride :], new_data])
+        # the old rows move down
+        new_data = self._get_rows(0, abs(shift), stride)
+        with profiler.stage("scroll"):
+            return b"".join([new_data, old_data[: kept_rows * stride]])
+
+    def _get_qimage(self, data, width, height, stride):
+        if bit_unpacker.is_packed_format(self.format):
+            with profiler.stage("unpack"):
+                return _unpack_to_qimage(
+                    data, width, height, stride, self.format, self.brightness
+                )
+
+        if self._palette_key is None:
+            return _to_qimage(
+                data, width, height, stride, self.format, self._native_format
+            )
+
+        with profiler.stage("unpack"):
+            data = _unpack_indices(
+                data,
+                width,
+                height,
+                stride,
+                self.get_bit_count(self.format),
+                _INDEXED_FORMATS[self.format],
+            )
+        with profiler.stage("palette"):
+            color_table = _get_color_table(self._palette_key)
+        image = QtGui.QImage(
+            data, width, height, width, QtGui.QImage.Format_Indexed8
+        )
+        image.setColorTable(color_table)
+        return image
+
+    def get_pixmap(self):
         pixmap = QtGui.QPixmap()
-        pixmap.convertFromImage(image)
+        pixmap.convertFromImage(self.get_image())
         return pixmap
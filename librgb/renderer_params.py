@@ -1,3 +1,4 @@
+from librgb.pixel_formats import PixelFormats
 from librgb.renderer import Renderer
 
 
@@ -9,6 +10,32 @@ class RendererParams(object):
         self._readers = []
         self._reader_idx = None
         self.reader = None
+        # rows of pixels start at multiples of this many bytes
+        self.row_alignment = 1
+        # where indexed formats take their colors from; the palette is read
+        # from the current reader unless palette_reader is set, and indices
+        # are shown as shades of gray while there's no palette_address
+        self.palette_reader = None
+        self.palette_address = None
+        self.palette_format = PixelFormats.BGR888
+        # while set, the differences from the same bytes of this reader are
+        # shown instead of the pixels
+        self.diff_reader = None
+
+    # A copy of the view, without the readers and the redraw callback.
+    def copy(self):
+        params = RendererParams()
+        params.format = self.format
+        params.width = self.width
+        params.height = self.height
+        params.flip = self.flip
+        params.brightness = self.brightness
+        params.row_alignment = self.row_alignment
+        params.palette_reader = self.palette_reader
+        params.palette_address = self.palette_address
+        params.palette_format = self.palette_format
+        params.diff_reader = self.diff_reader
+        return params
 
     @property
     def readers(self):
@@ -61,12 +88,23 @@ class RendererParams(object):
 
     @property
     def shown_bytes(self):
-        return self.canvas_size * Renderer.get_bit_count(self.format) // 8
+        return self.height * Renderer.get_stride(
+            self.format, self.width, self.row_alignment
+        )
 
     def fire_redraw(self):
         if hasattr(self, "draw_cb") and self.draw_cb:
             self.draw_cb()
 
+    # The readers that `<` and `>` switch to.
+    @property
+    def neighbouring_readers(self):
+        return [
+            self.readers[idx]
+            for idx in (self._reader_idx - 1, self._reader_idx + 1)
+            if 0 <= idx < len(self.readers)
+        ]
+
     def use_prev_reader(self):
         if self._reader_idx > 0:
             self._reader_idx -= 1
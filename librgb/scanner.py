@@ -0,0 +1,155 @@
+import collections
+import concurrent.futures
+import os
+
+from librgb.pixel_formats import PixelFormats
+from librgb.width_detector import detect_strides
+
+try:
+    import numpy
+
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+Candidate = collections.namedtuple(
+    "Candidate", "address size format width score"
+)
+
+_WINDOW_SIZE = 0x40000
+_MAX_WIDTH = 4096
+_MIN_STRIDE = 16
+_MIN_ENTROPY = 1.0
+_MAX_ENTROPY = 7.9
+
+# Format guessed for each pixel size; the scanner can't tell channel orders
+# apart, only the layout.
+_FORMATS = [
+    (1, PixelFormats.GRAY8),
+    (2, PixelFormats.RGB565),
+    (3, PixelFormats.BGR888),
+    (4, PixelFormats.BGRA8888),
+]
+
+
+def _get_entropy(arr):
+    counts = numpy.bincount(arr, minlength=256)
+    probabilities = counts[counts > 0] / float(len(arr))
+    return float(-(probabilities * numpy.log2(probabilities)).sum())
+
+
+def _get_correlation(arr, lag):
+    head = arr[:-lag]
+    tail = arr[lag:]
+    deviation = head.std() * tail.std()
+    if deviation == 0:
+        return 0.0
+    return float(((head - head.mean()) * (tail - tail.mean())).mean()) / (
+        deviation
+    )
+
+
+# How much neighboring pixels of the same channel correlate compared to
+# neighboring bytes, which for a wrong pixel size belong to other channels.
+def _get_channel_score(arr, pixel_size):
+    same_channel = _get_correlation(arr, pixel_size)
+    if pixel_size == 1:
+        return max(0.0, same_channel)
+    cross_channel = max(
+        _get_correlation(arr, lag) for lag in range(1, pixel_size)
+    )
+    return max(0.0, same_channel - cross_channel) + 0.1 * max(
+        0.0, same_channel
+    )
+
+
+# Returns the most plausible (format, width, score) for a window of data,
+# or None if the window doesn't look like an image at all.
+def score_window(data):
+    arr = numpy.frombuffer(data, dtype=numpy.uint8)
+    entropy = _get_entropy(arr)
+    if not _MIN_ENTROPY <= entropy <= _MAX_ENTROPY:
+        return None
+
+    samples = arr.astype(numpy.float32)
+    channel_score, pixel_size, pixel_format = max(
+        (_get_channel_score(samples, pixel_size), pixel_size, pixel_format)
+        for pixel_size, pixel_format in _FORMATS
+    )
+    if channel_score <= 0:
+        return None
+
+    for stride, row_score in detect_strides(
+        data,
+        pixel_size=pixel_size,
+        max_stride=_MAX_WIDTH * pixel_size,
+        count=3,
+    ):
+        if stride >= _MIN_STRIDE:
+            return (
+                pixel_format,
+                stride // pixel_size,
+                row_score * channel_score,
+            )
+    return None
+
+
+def _merge(candidates):
+    merged = []
+    for candidate in candidates:
+        if merged:
+            last = merged[-1]
+            if (
+                last.address + last.size == candidate.address
+                and last.format == candidate.format
+                and last.width == candidate.width
+            ):
+                merged[-1] = last._replace(
+                    size=last.size + candidate.size,
+                    score=max(last.score, candidate.score),
+                )
+                continue
+        merged.append(candidate)
+    return merged
+
+
+# Streams through the whole reader window by window and returns candidate
+# image locations, with adjacent windows of the same layout merged. Windows
+# are read on the calling thread (IDA's API isn't thread safe) and scored
+# on `jobs` threads - numpy releases the GIL for the heavy lifting. At most
+# two windows per thread are held in memory at a time.
+def scan(
+    reader, window_size=_WINDOW_SIZE, min_score=0.01, jobs=None, progress=None
+):
+    if not HAS_NUMPY:
+        raise RuntimeError("Scanning requires numpy")
+
+    jobs = jobs or os.cpu_count() or 1
+    executor = concurrent.futures.ThreadPoolExecutor(jobs)
+    max_pending = 2 * jobs
+    pending = collections.deque()
+    candidates = []
+
+    def collect(address, future):
+        result = future.result()
+        if progress:
+            progress(address)
+        if result is not None and result[2] >= min_score:
+            pixel_format, width, score = result
+            candidates.append(
+                Candidate(address, window_size, pixel_format, width, score)
+            )
+
+    with executor:
+        address = reader.min_address
+        while address < reader.max_address:
+            data = reader.get_padded_bytes_at(address, window_size)
+            pending.append((address, executor.submit(score_window, data)))
+            while len(pending) >= max_pending:
+                collect(*pending.popleft())
+            address += window_size
+        while pending:
+            collect(*pending.popleft())
+
+    return _merge(candidates)
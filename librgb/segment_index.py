@@ -0,0 +1,24 @@
+import bisect
+
+
+# Sorted, non-overlapping address ranges that can be intersected with
+# a requested range in O(log n + k) instead of scanning every range.
+class SegmentIndex(object):
+    def __init__(self, ranges):
+        self._ranges = sorted(
+            (start, end) for start, end in ranges if end > start
+        )
+        self._starts = [start for start, _end in self._ranges]
+
+    def __len__(self):
+        return len(self._ranges)
+
+    def intersect(self, start, end):
+        idx = max(0, bisect.bisect_right(self._starts, start) - 1)
+        while idx < len(self._ranges):
+            range_start, range_end = self._ranges[idx]
+            if range_start >= end:
+                break
+            if range_end > start:
+                yield max(start, range_start), min(end, range_end)
+            idx += 1
@@ -1,3 +1,9 @@
+from librgb.buffer_reader import BufferReader
+from librgb.pixel_formats import PixelFormats
+from librgb.renderer import Renderer
+from librgb.width_detector import detect_widths
+
+
 class ShortcutManager(object):
     def __init__(self, window_adapter, params):
         self.window_adapter = window_adapter
@@ -8,6 +14,7 @@ class ShortcutManager(object):
         return {
             "G": self.window_adapter.change_address,
             "Ctrl+S": self.window_adapter.save,
+            "Ctrl+Shift+S": self.window_adapter.save_animation,
             "H": self.resize_near_left,
             "J": self.resize_near_down,
             "K": self.resize_near_up,
@@ -17,6 +24,16 @@ class ShortcutManager(object):
             "Shift+K": self.resize_far_up,
             "Shift+L": self.resize_far_right,
             "Ctrl+F": self.toggle_flip,
+            "Ctrl+D": self.toggle_diff,
+            "W": self.detect_width,
+            "T": self.window_adapter.toggle_timings,
+            "Ctrl+R": self.window_adapter.toggle_auto_refresh,
+            "C": self.window_adapter.toggle_contact_sheet,
+            "B": self.window_adapter.add_bookmark,
+            "Shift+B": self.window_adapter.toggle_bookmarks,
+            "P": self.window_adapter.change_palette_address,
+            "Shift+P": self.cycle_palette_format,
+            "A": self.cycle_row_alignment,
             "left": self.go_near_left,
             "right": self.go_near_right,
             "Shift+left": self.go_near_medium_left,
@@ -56,6 +73,63 @@ class ShortcutManager(object):
     def toggle_flip(self):
         self.params.flip = not self.params.flip
 
+    # Snapshots the shown bytes and shows how the data differs from them
+    # from then on, e.g. after stepping in the debugger or switching files.
+    def toggle_diff(self):
+        if self.params.diff_reader is not None:
+            self.params.diff_reader = None
+            print("[librgb] Diff mode off")
+            return
+        reader = self.params.reader
+        if reader is None:
+            return
+        self.params.diff_reader = BufferReader(
+            reader, reader.address, self.params.shown_bytes
+        )
+        print("[librgb] Showing changes since %s" % reader.address_text)
+
+    def cycle_palette_format(self):
+        formats = [
+            pixel_format
+            for pixel_format in PixelFormats.get_short_names()
+            if Renderer.is_palette_format(pixel_format)
+        ]
+        # e.g. one kept in a bookmark saved by an older version starts over
+        if self.params.palette_format in formats:
+            idx = formats.index(self.params.palette_format)
+        else:
+            idx = -1
+        self.params.palette_format = formats[(idx + 1) % len(formats)]
+        print(
+            "[librgb] Palette format: %s"
+            % PixelFormats.get_long_names()[self.params.palette_format]
+        )
+
+    def cycle_row_alignment(self):
+        alignments = [1, 2, 4, 8, 16]
+        if self.params.row_alignment in alignments:
+            idx = alignments.index(self.params.row_alignment)
+            self.params.row_alignment = alignments[(idx + 1) % len(alignments)]
+        else:
+            self.params.row_alignment = alignments[0]
+        print("[librgb] Row alignment: %d" % self.params.row_alignment)
+
+    def detect_width(self):
+        reader = self.params.reader
+        if reader is None:
+            return
+        try:
+            widths = detect_widths(reader, reader.address, self.params.format)
+        except RuntimeError as ex:
+            print("[librgb] %s" % ex)
+            return
+        if widths:
+            print(
+                "[librgb] Likely widths: %s"
+                % ", ".join(str(width) for width, _score in widths)
+            )
+            self.params.width = widths[0][0]
+
     def go_near_left(self):
         self.params.reader.address -= 1
         self.params.fire_redraw()
@@ -0,0 +1,185 @@
+from librgb.pixel_formats import PixelFormats
+
+try:
+    import numpy
+
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+_ETC1_MODIFIERS = [
+    [2, 8, -2, -8],
+    [5, 17, -5, -17],
+    [9, 29, -9, -29],
+    [13, 42, -13, -42],
+    [18, 60, -18, -60],
+    [24, 80, -24, -80],
+    [33, 106, -33, -106],
+    [47, 183, -47, -183],
+]
+
+
+def _get_uint(blocks, start, size):
+    # little endian integer made of given bytes of each block
+    result = numpy.zeros(len(blocks), dtype=numpy.uint64)
+    for i in range(size):
+        result |= blocks[:, start + i].astype(numpy.uint64) << numpy.uint64(
+            8 * i
+        )
+    return result
+
+
+def _get_indices(bits, count, index_bits):
+    shifts = numpy.arange(count, dtype=numpy.uint64) * numpy.uint64(index_bits)
+    mask = numpy.uint64((1 << index_bits) - 1)
+    return ((bits[:, None] >> shifts) & mask).astype(numpy.intp)
+
+
+def _expand_565(colors):
+    blue = colors & 0x1F
+    green = (colors >> 5) & 0x3F
+    red = colors >> 11
+    return numpy.stack(
+        [
+            (blue << 3) | (blue >> 2),
+            (green << 2) | (green >> 4),
+            (red << 3) | (red >> 2),
+        ],
+        axis=-1,
+    )
+
+
+# BC1 color block: two RGB565 endpoints and a 2-bit index per pixel.
+def _decode_color(blocks, allow_transparency):
+    color0 = _get_uint(blocks, 0, 2).astype(numpy.int32)
+    color1 = _get_uint(blocks, 2, 2).astype(numpy.int32)
+    bgr0 = _expand_565(color0)
+    bgr1 = _expand_565(color1)
+    opaque = (color0 > color1)[:, None]
+    if not allow_transparency:
+        opaque = numpy.ones_like(opaque)
+
+    palette = numpy.empty((len(blocks), 4, 4), dtype=numpy.int32)
+    palette[:, 0, :3] = bgr0
+    palette[:, 1, :3] = bgr1
+    palette[:, 2, :3] = numpy.where(
+        opaque, (2 * bgr0 + bgr1) // 3, (bgr0 + bgr1) // 2
+    )
+    palette[:, 3, :3] = numpy.where(opaque, (bgr0 + 2 * bgr1) // 3, 0)
+    palette[:, :, 3] = 0xFF
+    palette[:, 3, 3] = numpy.where(opaque[:, 0], 0xFF, 0)
+
+    indices = _get_indices(_get_uint(blocks, 4, 4), 16, 2)
+    return palette[numpy.arange(len(blocks))[:, None], indices]
+
+
+# BC3 alpha block: two 8-bit endpoints and a 3-bit index per pixel.
+def _decode_alpha(blocks):
+    alpha0 = blocks[:, 0].astype(numpy.int32)[:, None]
+    alpha1 = blocks[:, 1].astype(numpy.int32)[:, None]
+    weights = numpy.arange(1, 7)
+    interpolated8 = ((7 - weights) * alpha0 + weights * alpha1) // 7
+    interpolated6 = ((5 - weights[:4]) * alpha0 + weights[:4] * alpha1) // 5
+    six_step = numpy.concatenate(
+        [
+            interpolated6,
+            numpy.zeros_like(alpha0),
+            numpy.full_like(alpha0, 0xFF),
+        ],
+        axis=1,
+    )
+    palette = numpy.concatenate(
+        [
+            alpha0,
+            alpha1,
+            numpy.where(alpha0 > alpha1, interpolated8, six_step),
+        ],
+        axis=1,
+    )
+    indices = _get_indices(_get_uint(blocks, 2, 6), 16, 3)
+    return palette[numpy.arange(len(blocks))[:, None], indices]
+
+
+def _decode_dxt1(blocks):
+    return _decode_color(blocks, allow_transparency=True)
+
+
+def _decode_dxt5(blocks):
+    pixels = _decode_color(blocks[:, 8:], allow_transparency=False)
+    pixels[:, :, 3] = _decode_alpha(blocks[:, :8])
+    return pixels
+
+
+def _decode_etc1(blocks):
+    bits = numpy.frombuffer(blocks.tobytes(), dtype=">u8").astype(numpy.int64)
+
+    def field(start, size):
+        return (bits >> start) & ((1 << size) - 1)
+
+    differential = field(33, 1).astype(bool)[:, None]
+    flipped = field(32, 1).astype(bool)[:, None]
+
+    # base colors of both sub-blocks, BGR
+    base1 = numpy.stack([field(59, 5), field(51, 5), field(43, 5)][::-1], 1)
+    delta = numpy.stack([field(56, 3), field(48, 3), field(40, 3)][::-1], 1)
+    base2 = base1 + numpy.where(delta >= 4, delta - 8, delta)
+    base1 = (base1 << 3) | (base1 >> 2)
+    base2 = ((base2 & 0x1F) << 3) | ((base2 & 0x1F) >> 2)
+    individual1 = numpy.stack(
+        [field(60, 4), field(52, 4), field(44, 4)][::-1], 1
+    )
+    individual2 = numpy.stack(
+        [field(56, 4), field(48, 4), field(40, 4)][::-1], 1
+    )
+    base1 = numpy.where(differential, base1, individual1 * 17)
+    base2 = numpy.where(differential, base2, individual2 * 17)
+
+    # pixels are numbered row by row, their index bits column by column
+    y, x = numpy.divmod(numpy.arange(16), 4)
+    second = numpy.where(flipped, y >= 2, x >= 2)
+    positions = x * 4 + y
+    index = (field(16, 16)[:, None] >> positions & 1) << 1 | (
+        field(0, 16)[:, None] >> positions & 1
+    )
+    table = numpy.where(second, field(34, 3)[:, None], field(37, 3)[:, None])
+    modifier = numpy.array(_ETC1_MODIFIERS)[table, index]
+
+    base = numpy.where(second[:, :, None], base2[:, None], base1[:, None])
+    pixels = numpy.empty((len(blocks), 16, 4), dtype=numpy.int32)
+    pixels[:, :, :3] = numpy.clip(base + modifier[:, :, None], 0, 0xFF)
+    pixels[:, :, 3] = 0xFF
+    return pixels
+
+
+# pixel format -> (bytes per 4x4 block, decoder)
+_DECODERS = {
+    PixelFormats.DXT1: (8, _decode_dxt1),
+    PixelFormats.DXT5: (16, _decode_dxt5),
+    PixelFormats.ETC1: (8, _decode_etc1),
+}
+
+
+def is_block_format(pixel_format):
+    return pixel_format in _DECODERS
+
+
+def get_block_size(pixel_format):
+    return _DECODERS[pixel_format][0]
+
+
+# Decodes whole rows of 4x4 blocks at once, returning an array of
+# (4 * block_rows, 4 * blocks_x) BGRA pixels.
+def decode_blocks(data, pixel_format, blocks_x, block_rows):
+    if not HAS_NUMPY:
+        raise RuntimeError("Compressed textures require numpy")
+
+    block_size, decoder = _DECODERS[pixel_format]
+    blocks = numpy.frombuffer(data, dtype=numpy.uint8)
+    blocks = blocks[: blocks_x * block_rows * block_size]
+    pixels = decoder(blocks.reshape(-1, block_size)).astype(numpy.uint8)
+    return (
+        pixels.reshape(block_rows, blocks_x, 4, 4, 4)
+        .transpose(0, 2, 1, 3, 4)
+        .reshape(block_rows * 4, blocks_x * 4, 4)
+    )
@@ -0,0 +1,59 @@
+from collections import OrderedDict
+
+from librgb.qt_shims import QtGui, QtWidgets
+
+
+# Shows the image of a renderer by rendering only the tiles that need to be
+# painted, i.e. the ones within the visible part of the enclosing scroll
+# area. Rendered tiles are cached, so scrolling back and forth is cheap.
+class TiledImageView(QtWidgets.QWidget):
+    TILE_SIZE = 256
+    MAX_CACHED_TILES = 256
+
+    def __init__(self, parent=None):
+        super(TiledImageView, self).__init__(parent)
+        self.renderer = None
+        self._tiles = OrderedDict()
+
+    def set_renderer(self, renderer):
+        self.renderer = renderer
+        self.setFixedSize(renderer.width, renderer.height)
+        self.update()
+
+    def paintEvent(self, event):  # pylint: disable=invalid-name
+        if self.renderer is None:
+            return
+        rect = event.rect()
+        size = self.TILE_SIZE
+        painter = QtGui.QPainter(self)
+        for y in range(
+            rect.top() // size * size,
+            min(rect.bottom() + 1, self.renderer.height),
+            size,
+        ):
+            for x in range(
+                rect.left() // size * size,
+                min(rect.right() + 1, self.renderer.width),
+                size,
+            ):
+                painter.drawPixmap(x, y, self._get_tile(x, y))
+        painter.end()
+
+    def _get_tile(self, x, y):
+        key = (self.renderer.key, x, y)
+        if key in self._tiles:
+            self._tiles.move_to_end(key)
+            return self._tiles[key]
+
+        image = self.renderer.get_tile(
+            x,
+            y,
+            min(self.TILE_SIZE, self.renderer.width - x),
+            min(self.TILE_SIZE, self.renderer.height - y),
+        )
+        tile = QtGui.QPixmap()
+        tile.convertFromImage(image)
+        self._tiles[key] = tile
+        if len(self._tiles) > self.MAX_CACHED_TILES:
+            self._tiles.popitem(last=False)
+        return tile
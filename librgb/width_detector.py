@@ -0,0 +1,102 @@
+from librgb.renderer import Renderer
+
+try:
+    import numpy
+
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+_MIN_ROWS = 4
+_NEIGHBORHOOD = 8
+_DEFAULT_SIZE = 0x100000
+
+
+def _get_autocorrelation(data, max_lag):
+    arr = numpy.frombuffer(data, dtype=numpy.uint8).astype(numpy.float32)
+    arr -= arr.mean()
+    variance = float(numpy.dot(arr, arr))
+    if variance == 0:
+        return None
+    fft_size = 1 << (2 * len(arr) - 1).bit_length()
+    spectrum = numpy.fft.rfft(arr, fft_size)
+    correlation = numpy.fft.irfft(spectrum * spectrum.conj(), fft_size)
+    correlation = correlation[: max_lag + 1] / variance
+    # unbias: longer lags overlap fewer bytes
+    return correlation * (len(arr) / (len(arr) - numpy.arange(max_lag + 1)))
+
+
+# Scores row strides (in bytes) by how much the autocorrelation of the byte
+# stream at that lag sticks out of its neighborhood. Lags are restricted to
+# multiples of the pixel size so that channel-to-channel correlation isn't
+# mistaken for a row. Returns up to `count` (stride, score) pairs, best
+# first, with harmonics (multiples of a better stride) folded into it.
+def detect_strides(data, pixel_size=1, max_stride=None, count=5):
+    if not HAS_NUMPY:
+        raise RuntimeError("Width detection requires numpy")
+
+    max_lag = len(data) // _MIN_ROWS
+    if max_stride is not None:
+        max_lag = min(max_lag, max_stride)
+    max_lag -= max_lag % pixel_size
+    if max_lag < 2 * pixel_size:
+        return []
+
+    correlation = _get_autocorrelation(
+        data, max_lag + _NEIGHBORHOOD * pixel_size
+    )
+    if correlation is None:
+        return []
+    correlation = correlation[::pixel_size]
+
+    lags = numpy.arange(2, max_lag // pixel_size + 1)
+    neighbors = numpy.stack(
+        [
+            correlation[numpy.maximum(lags + offset, 1)]
+            for offset in range(-_NEIGHBORHOOD, _NEIGHBORHOOD + 1)
+            if offset
+        ]
+    )
+    peaks = correlation[lags]
+    scores = numpy.where(
+        peaks >= neighbors.max(axis=0),
+        peaks - numpy.median(neighbors, axis=0),
+        0,
+    )
+
+    strides = []
+    for idx in numpy.argsort(scores)[::-1][: count * 10]:
+        score = float(scores[idx])
+        if score <= 0:
+            break
+        stride = int(lags[idx]) * pixel_size
+        if any(stride % known == 0 for known, _score in strides):
+            continue
+        harmonics = [item for item in strides if item[0] % stride == 0]
+        if harmonics:
+            # a fundamental that scores close to its harmonics wins
+            if score < max(item[1] for item in harmonics) / 2:
+                continue
+            strides = [item for item in strides if item not in harmonics]
+        strides.append((stride, score))
+    return sorted(strides, key=lambda item: -item[1])[:count]
+
+
+# Proposes the most likely image widths for the data at given address.
+def detect_widths(
+    reader, address, pixel_format, size=None, max_width=4096, count=5
+):
+    if size is None:
+        size = max(1, min(_DEFAULT_SIZE, reader.max_address - address))
+    bits = Renderer.get_bit_count(pixel_format)
+    # pixels that don't take whole bytes can't restrict the lags
+    pixel_size = bits // 8 if bits % 8 == 0 else 1
+    data = reader.get_padded_bytes_at(address, size)
+    strides = detect_strides(
+        data,
+        pixel_size=pixel_size,
+        max_stride=Renderer.get_stride(pixel_format, max_width),
+        count=count,
+    )
+    return [(stride * 8 // bits, score) for stride, score in strides]
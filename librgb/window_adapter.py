@@ -1,22 +1,69 @@
+from librgb import animation, profiler
+from librgb.bookmark_view import BookmarkView
+from librgb.bookmarks import Bookmark, BookmarkStore
+from librgb.contact_sheet import ContactSheetView
 from librgb.pixel_formats import PixelFormats
 from librgb.qt_shims import QtCore, QtGui, QtWidgets
+from librgb.redraw_scheduler import RedrawScheduler
+from librgb.render_worker import Prerenderer, RenderWorker
 from librgb.renderer import Renderer
+from librgb.tiled_view import TiledImageView
+
+
+# Stands in for a renderer so that a RenderWorker computes the diff summary
+# of a tiled canvas, which reads all of it, off the GUI thread.
+class _DiffSummary(object):
+    def __init__(self, renderer):
+        self.renderer = renderer
+
+    def get_image(self, _is_cancelled=None):
+        return self.renderer.get_diff_summary()
 
 
 class GenericWindowAdapter(object):
+    # larger canvases are rendered tile by tile as they get scrolled into view
+    TILED_CANVAS_SIZE = 2048 * 2048
+    MAX_SIZE = 0x10000
+    DEFAULT_REFRESH_FPS = 30
+    ANIMATION_FPS = 10
+    MAX_ANIMATION_FRAMES = 300
+    # how long the view has to stay put before the neighbours get rendered
+    PRERENDER_DELAY = 250
+
     def __init__(self, params):
         self.params = params
         self.upper_toolbar = None
         self.lower_toolbar = None
-        self.scroll_are = None
+        self.scroll_area = None
         self.format_box = None
         self.brightness_box = None
         self.width_box = None
         self.height_box = None
         self.address_label = None
         self.size_label = None
+        self.timings_label = None
         self.image_label = None
+        self.tiled_view = None
+        self.contact_sheet = None
+        self.contact_sheet_mode = None
+        self.bookmark_view = None
+        self.bookmarks_shown = False
+        self.bookmark_stores = {}
         self.flip_checkbox = None
+        self.last_frame = None
+        self.redraw_scheduler = RedrawScheduler(self.draw)
+        self.render_worker = RenderWorker(self.image_rendered)
+        self.diff_summary_worker = RenderWorker(
+            lambda _job, summary: self.show_diff_summary_text(summary)
+        )
+        self.prerenderer = Prerenderer()
+        self.prerender_timer = QtCore.QTimer()
+        self.prerender_timer.setSingleShot(True)
+        self.prerender_timer.setInterval(self.PRERENDER_DELAY)
+        self.prerender_timer.timeout.connect(self.prerender)
+        self.refresh_fps = self.DEFAULT_REFRESH_FPS
+        self.refresh_timer = QtCore.QTimer()
+        self.refresh_timer.timeout.connect(self.auto_refresh)
 
     def create_layout(self):
         layout = QtWidgets.QVBoxLayout()
@@ -37,11 +84,14 @@ class GenericWindowAdapter(object):
 
         self.image_label = QtWidgets.QLabel()
         self.image_label.setAlignment(QtCore.Qt.AlignCenter)
-        scroll_area = QtWidgets.QScrollArea()
-        scroll_area.setWidget(self.image_label)
-        scroll_area.setWidgetResizable(True)
+        self.tiled_view = TiledImageView()
+        self.contact_sheet = ContactSheetView(self.contact_sheet_chosen)
+        self.bookmark_view = BookmarkView(self.bookmark_chosen)
+        self.scroll_area = QtWidgets.QScrollArea()
+        self.scroll_area.setWidget(self.image_label)
+        self.scroll_area.setWidgetResizable(True)
         layout.addLayout(upper_toolbar)
-        layout.addWidget(scroll_area)
+        layout.addWidget(self.scroll_area)
         layout.addLayout(lower_toolbar)
 
         return layout
@@ -70,13 +120,13 @@ class GenericWindowAdapter(object):
     def add_size_boxes(self, layout):
         self.width_box = QtWidgets.QSpinBox()
         self.width_box.setMinimum(1)
-        self.width_box.setMaximum(4096)
+        self.width_box.setMaximum(self.MAX_SIZE)
         self.width_box.valueChanged.connect(self.width_changed)
         layout.addWidget(self.width_box)
         layout.addWidget(QtWidgets.QLabel("x"))
         self.height_box = QtWidgets.QSpinBox()
         self.height_box.setMinimum(1)
-        self.height_box.setMaximum(4096)
+        self.height_box.setMaximum(self.MAX_SIZE)
         self.height_box.valueChanged.connect(self.height_changed)
         layout.addWidget(self.height_box)
 
@@ -90,8 +140,11 @@ class GenericWindowAdapter(object):
         layout.addWidget(QtWidgets.QLabel("Address:"))
         self.address_label = QtWidgets.QLabel("...")
         self.size_label = QtWidgets.QLabel("...")
+        self.timings_label = QtWidgets.QLabel()
+        self.timings_label.setVisible(False)
         layout.addWidget(self.address_label)
         layout.addWidget(self.size_label)
+        layout.addWidget(self.timings_label)
 
     def add_save_button(self, layout):
         save_button = QtWidgets.QPushButton("&Save...")
@@ -100,7 +153,7 @@ class GenericWindowAdapter(object):
 
     def add_redraw_button(self, layout):
         redraw_button = QtWidgets.QPushButton("&Redraw")
-        redraw_button.clicked.connect(self.draw)
+        redraw_button.clicked.connect(self.force_redraw)
         layout.addWidget(redraw_button)
 
     def define_shortcut(self, shortcut, widget, func):
@@ -133,13 +186,83 @@ class GenericWindowAdapter(object):
             self.params.reader.address = address
             self.params.fire_redraw()
 
+    def change_palette_address(self):
+        reader = self.params.palette_reader or self.params.reader
+        address = self.ask_address(
+            reader.address
+            if self.params.palette_address is None
+            else self.params.palette_address
+        )
+        if address is not None:
+            self.params.palette_address = address
+
     def save(self):
         path = self.ask_file()
         if path is not None:
-            self.image_label.pixmap().save(path, "PNG")
+            image = self.get_shown_image()
+            if image is not None:
+                image.save(path, "PNG")
+
+    # Saves one frame per file if there are several, otherwise the pages from
+    # the current address on.
+    def save_animation(self):
+        reader = self.params.reader
+        if reader is None:
+            return
+        if len(self.params.readers) > 1:
+            frames = animation.get_reader_frames(self.params.readers)
+        else:
+            frames = animation.get_sweep_frames(
+                reader,
+                reader.address,
+                reader.max_address,
+                self.params.shown_bytes,
+            )
+        frames = frames[: self.MAX_ANIMATION_FRAMES]
+        if not frames:
+            print("[librgb] There are no frames to export")
+            return
+        path = self.ask_animation_file()
+        if not path:
+            return
+
+        dialog = QtWidgets.QProgressDialog(
+            "Saving %s..." % path, "Cancel", 0, len(frames)
+        )
+        dialog.setWindowModality(QtCore.Qt.ApplicationModal)
+
+        def progress(count):
+            dialog.setValue(count)
+            QtWidgets.QApplication.processEvents()
+
+        try:
+            count = animation.export_animation(
+                self.params,
+                frames,
+                path,
+                self.ANIMATION_FPS,
+                progress=progress,
+                is_cancelled=dialog.wasCanceled,
+            )
+        except (OSError, RuntimeError, ValueError) as ex:
+            print("[librgb] Couldn't save %s: %s" % (path, ex))
+            return
+        finally:
+            dialog.close()
+        print("[librgb] Saved %d frames to %s" % (count, path))
+
+    # The image currently shown, or None while showing thumbnails.
+    def get_shown_image(self):
+        widget = self.scroll_area.widget()
+        if widget is self.tiled_view:
+            return self.tiled_view.renderer.get_image()
+        if widget is self.image_label and self.image_label.pixmap():
+            return self.image_label.pixmap().toImage()
+        return None
 
     def draw(self):
         self.params.draw_cb = None
+        self.diff_summary_worker.cancel()
 
         if self.params.reader is None:
             self.address_label.setText("UNAVAILABLE")
@@ -148,6 +271,13 @@ class GenericWindowAdapter(object):
             self.size_label.setText(
                 "(showing %d bytes)" % self.params.shown_bytes
             )
+            self.size_label.setToolTip(
+                "%d frames rendered, %d dropped"
+                % (
+                    self.redraw_scheduler.rendered_frames,
+                    self.redraw_scheduler.dropped_frames,
+                )
+            )
         self.flip_checkbox.setCheckState(
             QtCore.Qt.Checked if self.params.flip else QtCore.Qt.Unchecked
         )
@@ -158,10 +288,212 @@ class GenericWindowAdapter(object):
             self.format_box.findData(self.params.format)
         )
 
-        pixmap = Renderer(self.params).get_pixmap()
+        store = self.get_bookmark_store() if self.bookmarks_shown else None
+        if store is not None:
+            self.render_worker.cancel()
+            self.bookmark_view.show_bookmarks(
+                store, self.get_grid_columns(BookmarkView.PREVIEW_SIZE)
+            )
+            self.show_widget(self.bookmark_view)
+            self.params.draw_cb = self.request_redraw
+            return
+        self.bookmarks_shown = False
+
+        if self.contact_sheet_mode is not None:
+            self.render_worker.cancel()
+            self.contact_sheet.show_cells(
+                self.params,
+                self.contact_sheet_mode,
+                self.get_grid_columns(ContactSheetView.THUMBNAIL_SIZE),
+            )
+            self.show_widget(self.contact_sheet)
+            self.params.draw_cb = self.request_redraw
+            return
+
+        renderer = Renderer(self.params, previous_frame=self.last_frame)
+        if self.params.canvas_size > self.TILED_CANVAS_SIZE:
+            self.render_worker.cancel()
+            self.tiled_view.set_renderer(renderer)
+            self.show_widget(self.tiled_view)
+            if renderer.diff_reader is not None:
+                self.diff_summary_worker.submit(_DiffSummary(renderer))
+        else:
+            prerendered = self.prerenderer.take(renderer.key)
+            if prerendered is not None:
+                self.render_worker.cancel()
+                self.image_rendered(*prerendered)
+            else:
+                # the neighbours can wait, the shown image can't
+                self.prerender_timer.stop()
+                self.prerenderer.cancel()
+                self.render_worker.submit(renderer)
+
+        self.params.draw_cb = self.request_redraw
+
+    def request_redraw(self):
+        # the parameters are already stale, no point in finishing the render
+        self.render_worker.cancel()
+        self.diff_summary_worker.cancel()
+        self.redraw_scheduler.schedule()
+
+    def force_redraw(self):
+        # don't reuse anything from the previous frame
+        self.last_frame = None
+        if self.params.reader is not None:
+            self.params.reader.refresh()
+        self.draw()
+
+    # Re-reads the data up to `fps` times per second and redraws if it
+    # changed, for data that changes on its own like memory of a running
+    # process. 0 turns it off.
+    def set_auto_refresh(self, fps):
+        if fps:
+            self.refresh_fps = fps
+            self.refresh_timer.start(max(1, int(1000 / fps)))
+        else:
+            self.refresh_timer.stop()
+
+    def toggle_auto_refresh(self):
+        if self.refresh_timer.isActive():
+            self.set_auto_refresh(0)
+            print("[librgb] Auto refresh off")
+        else:
+            self.set_auto_refresh(self.refresh_fps)
+            print("[librgb] Auto refresh at %g FPS" % self.refresh_fps)
+
+    def auto_refresh(self):
+        # skip the frame rather than cancel the one still being rendered
+        if (
+            self.params.reader is None
+            or self.render_worker.busy
+            or self.redraw_scheduler.pending
+        ):
+            return
+        if self.params.reader.refresh():
+            self.request_redraw()
+
+    def image_rendered(self, renderer, image):
+        self.last_frame = renderer.frame
+        with profiler.collect(renderer.timings), profiler.stage("pixmap"):
+            pixmap = QtGui.QPixmap()
+            pixmap.convertFromImage(image)
         self.image_label.setPixmap(pixmap)
+        self.show_widget(self.image_label)
+        self.show_diff_summary(renderer)
+        self.timings_label.setText("[%s]" % renderer.timings)
+        profiler.finish(renderer.timings)
+        # paging through the data is the most common way to move around
+        renderer.reader.prefetch(renderer.address, self.params.shown_bytes)
+        self.prerender_timer.start()
 
-        self.params.draw_cb = self.draw
+    # Renders the neighbouring files, unless the view moved on meanwhile.
+    def prerender(self):
+        if self.render_worker.busy or self.redraw_scheduler.pending:
+            return
+        self.prerenderer.submit(
+            Renderer(self.params, reader=reader)
+            for reader in self.params.neighbouring_readers
+        )
+
+    # Cycles between the image, thumbnails of all formats and thumbnails of
+    # nearby widths.
+    def toggle_contact_sheet(self):
+        modes = [None, ContactSheetView.FORMATS, ContactSheetView.WIDTHS]
+        idx = modes.index(self.contact_sheet_mode)
+        self.contact_sheet_mode = modes[(idx + 1) % len(modes)]
+        if self.contact_sheet_mode is None:
+            self.contact_sheet.clear()
+        self.bookmarks_shown = False
+        self.bookmark_view.clear()
+        self.draw()
+
+    def contact_sheet_chosen(self, pixel_format, width):
+        self.contact_sheet_mode = None
+        self.contact_sheet.clear()
+        self.params.draw_cb = None
+        self.params.format = pixel_format
+        self.params.width = width
+        self.draw()
+
+    # The bookmarks of the data of the current reader, or None if it has no
+    # content key.
+    def get_bookmark_store(self):
+        reader = self.params.reader
+        key = None if reader is None else reader.content_key
+        if key is None:
+            return None
+        if key not in self.bookmark_stores:
+            self.bookmark_stores[key] = BookmarkStore(key)
+        return self.bookmark_stores[key]
+
+    def add_bookmark(self):
+        store = self.get_bookmark_store()
+        if store is None:
+            print("[librgb] This data can't be bookmarked")
+            return
+        name = self.ask_bookmark_name(
+            "%X %s %dx%d"
+            % (
+                self.params.reader.address,
+                PixelFormats.get_short_names()[self.params.format],
+                self.params.width,
+                self.params.height,
+            )
+        )
+        if not name:
+            return
+
+        preview = self.get_shown_image()
+        if preview is not None and not preview.isNull():
+            preview = preview.scaled(
+                BookmarkView.PREVIEW_SIZE,
+                BookmarkView.PREVIEW_SIZE,
+                QtCore.Qt.KeepAspectRatio,
+                QtCore.Qt.SmoothTransformation,
+            )
+        try:
+            store.add(Bookmark.from_params(name, self.params), preview)
+        except OSError as ex:
+            print("[librgb] Couldn't save the bookmark: %s" % ex)
+            return
+        print("[librgb] Bookmarked %s" % name)
+
+    def toggle_bookmarks(self):
+        self.bookmarks_shown = not self.bookmarks_shown
+        if self.bookmarks_shown:
+            self.contact_sheet_mode = None
+            self.contact_sheet.clear()
+        else:
+            self.bookmark_view.clear()
+        self.draw()
+
+    def bookmark_chosen(self, bookmark):
+        self.bookmarks_shown = False
+        self.bookmark_view.clear()
+        self.params.draw_cb = None
+        bookmark.apply(self.params)
+        self.draw()
+
+    def get_grid_columns(self, cell_size):
+        return max(1, self.scroll_area.viewport().width() // (cell_size + 16))
+
+    def show_diff_summary(self, renderer):
+        self.show_diff_summary_text(renderer.get_diff_summary())
+
+    def show_diff_summary_text(self, summary):
+        if summary is not None:
+            self.size_label.setText(
+                "(showing %d bytes, %s)" % (self.params.shown_bytes, summary)
+            )
+
+    def toggle_timings(self):
+        self.timings_label.setVisible(not self.timings_label.isVisible())
+
+    def show_widget(self, widget):
+        if self.scroll_area.widget() is not widget:
+            # take the old widget first, setWidget() would delete it
+            self.scroll_area.takeWidget()
+            self.scroll_area.setWidget(widget)
 
     def ask_address(self, address):
         text, confirmed = QtWidgets.QInputDialog.getText(
@@ -174,6 +506,24 @@ class GenericWindowAdapter(object):
             return int(text, 16)
         return None
 
+    def ask_bookmark_name(self, name):
+        text, confirmed = QtWidgets.QInputDialog.getText(
+            None,
+            "Input Dialog",
+            "Please enter a name for the bookmark:",
+            text=name,
+        )
+        if confirmed:
+            return text
+        return None
+
+    def ask_animation_file(self):
+        ret, _ = QtWidgets.QFileDialog.getSaveFileName(
+            caption="Save the animation as...",
+            filter="*.png *.apng *.gif *.mp4 *.webm",
+        )
+        return ret
+
     def ask_file(self):
         ret, _ = QtWidgets.QFileDialog.getSaveFileName(
             caption="Save the image as...", filter="*.png"
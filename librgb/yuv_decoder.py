@@ -0,0 +1,128 @@
+import functools
+
+from librgb.pixel_formats import PixelFormats
+
+try:
+    import numpy
+
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+# pixel format -> whether chroma is subsampled vertically too (4:2:0)
+_FORMATS = {
+    PixelFormats.NV12: True,
+    PixelFormats.I420: True,
+    PixelFormats.YUYV: False,
+    PixelFormats.UYVY: False,
+}
+
+
+def is_yuv_format(pixel_format):
+    return pixel_format in _FORMATS
+
+
+# Whether the chroma of given format follows the whole luma plane, which
+# makes the layout of the image depend on its height.
+def is_planar_format(pixel_format):
+    return _FORMATS.get(pixel_format, False)
+
+
+# BT.601 limited range in 8.8 fixed point, with the brightness multiplier
+# folded in: Y, V->R, U->G, V->G, U->B.
+@functools.lru_cache(maxsize=16)
+def _get_coefficients(multiplier):
+    return [
+        int(round(coefficient * multiplier))
+        for coefficient in (298, 409, 100, 208, 516)
+    ]
+
+
+def _read_planes(read, pixel_format, width, height, first_row, row_count):
+    chroma_width = (width + 1) // 2
+    if pixel_format in (PixelFormats.YUYV, PixelFormats.UYVY):
+        row_size = chroma_width * 4
+        arr = numpy.frombuffer(
+            read(first_row * row_size, row_count * row_size), numpy.uint8
+        ).reshape(row_count, chroma_width, 4)
+        if pixel_format == PixelFormats.YUYV:
+            luma, u, v = arr[:, :, 0::2], arr[:, :, 1], arr[:, :, 3]
+        else:
+            luma, u, v = arr[:, :, 1::2], arr[:, :, 0], arr[:, :, 2]
+        return luma.reshape(row_count, 1, chroma_width, 2), u, v
+
+    luma = numpy.frombuffer(
+        read(first_row * width, row_count * width), numpy.uint8
+    ).reshape(row_count, width)
+    if width % 2:
+        luma = numpy.pad(luma, ((0, 0), (0, 1)), mode="edge")
+    luma = luma.reshape(row_count // 2, 2, chroma_width, 2)
+
+    chroma_rows = row_count // 2
+    chroma_start = width * height
+    if pixel_format == PixelFormats.NV12:
+        row_size = chroma_width * 2
+        chroma = numpy.frombuffer(
+            read(
+                chroma_start + first_row // 2 * row_size,
+                chroma_rows * row_size,
+            ),
+            numpy.uint8,
+        ).reshape(chroma_rows, chroma_width, 2)
+        return luma, chroma[:, :, 0], chroma[:, :, 1]
+
+    plane_size = chroma_width * ((height + 1) // 2)
+    u, v = [
+        numpy.frombuffer(
+            read(
+                chroma_start
+                + plane * plane_size
+                + first_row // 2 * chroma_width,
+                chroma_rows * chroma_width,
+            ),
+            numpy.uint8,
+        ).reshape(chroma_rows, chroma_width)
+        for plane in (0, 1)
+    ]
+    return luma, u, v
+
+
+# Converts given rows of a YUV image to BGRX pixels. `read(offset, size)`
+# returns the bytes at given offset from the start of the image. Chroma is
+# converted at its own resolution and only broadcast over the luma samples
+# it covers, and flipping merely reverses the views of the input. When
+# chroma is subsampled vertically, whole pairs of rows get converted, so
+# this returns the first row converted along with the pixels.
+def decode_yuv(
+    read, pixel_format, width, height, first_row, row_count, flip, multiplier
+):
+    if not HAS_NUMPY:
+        raise RuntimeError("YUV formats require numpy")
+
+    if _FORMATS[pixel_format]:
+        last_row = first_row + row_count
+        first_row -= first_row % 2
+        row_count = last_row + last_row % 2 - first_row
+    luma, u, v = _read_planes(
+        read, pixel_format, width, height, first_row, row_count
+    )
+    if flip:
+        luma, u, v = luma[::-1, ::-1], u[::-1], v[::-1]
+
+    k_y, k_rv, k_gu, k_gv, k_bu = _get_coefficients(multiplier)
+    base = (luma.astype(numpy.int32) - 16) * k_y + 128
+    u = u.astype(numpy.int32) - 128
+    v = v.astype(numpy.int32) - 128
+    out = numpy.empty(luma.shape + (4,), dtype=numpy.uint8)
+    for channel, chroma in (
+        (0, k_bu * u),
+        (1, -k_gu * u - k_gv * v),
+        (2, k_rv * v),
+    ):
+        value = base + chroma[:, None, :, None]
+        value >>= 8
+        numpy.clip(value, 0, 0xFF, out=value)
+        out[..., channel] = value
+    out[..., 3] = 0xFF
+    return first_row, out.reshape(row_count, -1, 4)
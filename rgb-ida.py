@@ -70,13 +70,23 @@ class ImagePreviewPlugin(idaapi.plugin_t):
             def ask_address(self, address):
                 return ida_kernwin.ask_addr(address, "Please enter an address")
 
+            def ask_bookmark_name(self, name):
+                return ida_kernwin.ask_str(
+                    name, 0, "Please enter a name for the bookmark"
+                )
+
+            def ask_animation_file(self):
+                return ida_kernwin.ask_file(
+                    1, "*.png", "Save the animation as..."
+                )
+
             def ask_file(self):
                 return ida_kernwin.ask_file(1, "*.png", "Save the image as...")
 
         image_preview_form = DockableShim("Image preview")
 
         params = librgb.RendererParams()
-        params.readers = [librgb.MemoryReader()]
+        params.readers = [librgb.PrefetchingReader(librgb.MemoryReader())]
         params.format = librgb.PixelFormats.GRAY8
         params.width = 800
         params.height = 600